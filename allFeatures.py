@@ -1,11 +1,7 @@
 import tkinter as tk
 import threading
-import requests
-from bs4 import BeautifulSoup
 import webbrowser
-import random
 import time
-import re
 import math
 from collections import Counter
 import atexit
@@ -18,21 +14,37 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import glob
 import logging
+import queue
+from scraper import scrape_random_sample, iter_random_sample, get_scraper_stats, set_seen_check, set_candidate_scorer, article_key, start_parse_workers, CancelToken, warm_up_connections
+from seenFilter import get_seen_filter
+from articleStore import take_articles, crawler_is_running
+from feed import SingleFlight, FeedBuffer, PrefetchScheduler
+
+# Startup timing, measured from here
+app_start_time = time.time()
 
 # File to store next articles to preload
 PRELOAD_FILE = "next_articles.json"
-FURTHEST_NATURE_DIRECTORY_PAGE = 1000
 ABSTRACT_SAVE_CUTOFF_SCORE = 15
 SAVE_DIRECTORY = "saved_abstracts"
 NUM_FILES_TO_SAVE_TO_PRELOAD = 20
 SIZE_OF_LOAD_BATCH = 5
-MAX_UNSEEN_FILES_LOADED_IN = 50
+MAX_UNSEEN_FILES_LOADED_IN = 50    # high watermark, refills stop adding articles past this many unseen
+FEED_LOW_WATERMARK = 3             # always refill the feed when fewer unseen articles than this are left
+FEED_REFILL_SIZE = 10              # articles scraped by one refill
 MAX_SAVED_BEST_ABSTRACTS_PER_SESSION = 10
 MAX_NUM_SAVED_BEST_FILES = 8
 VIEW_POINT_HOW_OFTEN = 5    # in seconds
 MAX_VIEW_POINTS = 10
 LIKE_POINTS = 10
 CLICK_POINTS = 20
+ARTICLE_HANDOFF_POLL_MS = 100   # how often the Tk thread picks up articles scraped in the background
+SHUTDOWN_GRACE = 2              # in seconds, for background scrapes to stop when the app exits
+EXIT_PRELOAD_DEADLINE = 5       # in seconds, for the scrape that tops up the preload file on exit
+PREFETCH_MARGIN = 5             # in seconds, refills should land at least this long before the feed runs dry
+PREFETCH_INITIAL_DWELL = 10     # in seconds per article, until the user's reading speed is measured
+PREFETCH_INITIAL_LATENCY = 15   # in seconds per refill, until refills are measured
+PREFETCH_MAX_DWELL = MAX_VIEW_POINTS * VIEW_POINT_HOW_OFTEN   # longer views count as this long
 
 # Function to preprocess text
 def preprocess_text(text):
@@ -51,31 +63,38 @@ def load_saved_abstracts(directory="saved_abstracts"):
                 saved_abstracts.append(data['abstract'])  # Assuming 'abstract' key in saved files
     return saved_abstracts
 
-def rank_articles_by_similarity_with_saved_corpus(scraped_articles, saved_corpus):
-    # Preprocess the saved corpus and scraped abstracts
+# Function to score texts by their mean TF-IDF cosine similarity to the saved corpus.
+# Returns None if there is nothing to compare.
+def similarity_to_saved_corpus(texts, saved_corpus):
+    # Preprocess the saved corpus and the texts
     saved_corpus = [preprocess_text(abstract) for abstract in saved_corpus]
-    scraped_texts = [preprocess_text(article['abstract']) for article in scraped_articles]
+    texts = [preprocess_text(text) for text in texts]
 
     # Check for empty corpus
     if not saved_corpus or all(len(text.strip()) == 0 for text in saved_corpus):
         logger.warning("Error: No valid abstracts in the saved corpus. Cannot compute similarity.")
-        return [(article) for article in scraped_articles]
+        return None
 
-    if not scraped_texts or all(len(text.strip()) == 0 for text in scraped_texts):
+    if not texts or all(len(text.strip()) == 0 for text in texts):
         logger.warning("Error: No valid scraped articles for ranking. Returning original order.")
-        return [(article) for article in scraped_articles]
+        return None
 
     # Compute TF-IDF vectors
     vectorizer = TfidfVectorizer()
     try:
         corpus_tfidf = vectorizer.fit_transform(saved_corpus)  # Fit on the saved corpus
-        articles_tfidf = vectorizer.transform(scraped_texts)  # Transform scraped abstracts
+        texts_tfidf = vectorizer.transform(texts)  # Transform the texts to score
     except ValueError as e:
         logger.warning("Error computing TF-IDF: %s", e)
-        return [(article) for article in scraped_articles]
+        return None
+
+    # Compute similarity between each text and the saved corpus
+    return cosine_similarity(texts_tfidf, corpus_tfidf).mean(axis=1)
 
-    # Compute similarity between each scraped article and the saved corpus
-    similarity_scores = cosine_similarity(articles_tfidf, corpus_tfidf).mean(axis=1)
+def rank_articles_by_similarity_with_saved_corpus(scraped_articles, saved_corpus):
+    similarity_scores = similarity_to_saved_corpus([article['abstract'] for article in scraped_articles], saved_corpus)
+    if similarity_scores is None:
+        return [(article) for article in scraped_articles]
 
     # Combine scraped articles with their similarity scores
     ranked_articles = sorted(
@@ -89,72 +108,9 @@ def rank_articles_by_similarity_with_saved_corpus(scraped_articles, saved_corpus
         just_articles.append(item[0])
     return just_articles
 
-# Function to scrape a single random article from a given page
-def scrape_random_article_from_page(page_number):
-    try:
-        logger.info("Scraping a random article from page %s...", page_number)
-        url = f"https://www.nature.com/nature/research-articles?searchType=journalSearch&sort=PubDate&page={page_number}"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Check if request was successful
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Find all articles on the page
-        articles = soup.find_all('article', class_='u-full-height c-card c-card--flush')
-        if not articles:
-            logger.info("No articles found on page %s.", page_number)
-            return None
-
-        # Randomly select one article from the page
-        article = random.choice(articles)
-        title = article.find('h3', class_='c-card__title').get_text(strip=True)
-        article_url = "https://www.nature.com" + article.find('a')['href']
-        logger.info("Scraping article: %s", title)
-
-        # Get the article page to extract the abstract
-        article_response = requests.get(article_url, timeout=10)
-        article_response.raise_for_status()
-        article_soup = BeautifulSoup(article_response.text, 'html.parser')
-
-        # Attempt to extract the abstract
-        abstract_section = article_soup.find('div', {'class': 'c-article-section__content'})
-        if abstract_section:
-            abstract_text = abstract_section.get_text(strip=True)
-
-            # Remove reference numbers (e.g., [1], [10])
-            #abstract_text = re.sub(r'\[\d+\]', '', abstract_text)
-            abstract_text = re.sub(r'(\w)(\d+(,\d+)*)', r'\1', abstract_text)
-            logger.info("Abstract cleaned for: %s", title)
-        else:
-            abstract_text = "Abstract not available."
-
-        # Return the scraped article data
-        return {"title": title, "abstract": abstract_text, "url": article_url, "score": 0, "liked": False}
-
-    except (requests.RequestException, Exception) as e:
-        logger.warning("Error scraping article from page %s: %s", page_number, e)
-        return None
-
-# Function to scrape a random sample of articles from the first FURTHEST_NATURE_DIRECTORY_PAGE pages
-def scrape_random_sample(sample_size=10):
-    logger.info("Starting random sample scrape of size %s...", sample_size)
-    scraped_articles = []
-    random_pages = random.sample(range(1, FURTHEST_NATURE_DIRECTORY_PAGE + 1), sample_size)  # Randomly select unique page numbers
-
-    for page_number in random_pages:
-        article = scrape_random_article_from_page(page_number)
-        if article:
-            scraped_articles.append(article)
-
-        # Stop if we already have 10 articles
-        if len(scraped_articles) == sample_size:
-            break
-
-    logger.info("Scraped %s articles.", len(scraped_articles))
-    return scraped_articles
-
 # Function to display a new abstract based on the current index
 def display_abstract(index):
-    global last_scroll_time # added
+    global last_scroll_time, displayed_index # added
     if index < len(abstracts):
         abstract_data = abstracts[index]
         # Clear existing text
@@ -168,12 +124,21 @@ def display_abstract(index):
         abstract_label.insert(tk.END, abstract_data['abstract'])
         abstract_label.config(state=tk.DISABLED)
         logger.info("Displayed abstract: %s", abstract_data['title'])
+        get_seen_filter().add(article_key(abstract_data['url']))
 
         # added to give articles score based on how long on them
         time_spent = time.time() - last_scroll_time
         points = min(10, int(time_spent // 5))
         abstracts[index]['score'] += points
         last_scroll_time = last_scroll_time + time_spent
+
+        # Update the reading speed estimate before the feed decides whether to refill. Only
+        # time spent before moving to a different article is reading time, the first paint
+        # and a re-display of the same article have none behind them.
+        if displayed_index is not None and index != displayed_index:
+            prefetch.record_view(time_spent)
+        displayed_index = index
+        abstracts.mark_seen(index)
        
         if abstracts[current_abstract_index]['liked']:
             like_button.config(state=tk.DISABLED)
@@ -195,19 +160,69 @@ def open_article(event):
     webbrowser.open(abstract_data['url'])
     logger.info("Opened article URL: %s", abstract_data['url'])
 
-# Modify the scroll function to trigger loading more articles
+# Function to check whether more articles are on their way to the feed
+def articles_pending():
+    return refills.busy or abstracts.refill_pending
+
+# Function to show a loading message at the end of the feed while more articles are
+# on their way, instead of stopping there
+def wait_for_next_article():
+    global waiting_for_articles, displayed_index
+    # The time until now was spent reading the article the user is leaving
+    prefetch.record_view(time.time() - last_scroll_time)
+    displayed_index = None
+    waiting_for_articles = True
+    prefetch.stall_started()
+    logger.info("Waiting for more articles...")
+    abstract_label.config(state=tk.NORMAL)
+    abstract_label.delete(1.0, tk.END)
+    abstract_label.insert(tk.END, "Loading more articles...", 'title')
+    abstract_label.config(state=tk.DISABLED)
+    like_button.config(state=tk.DISABLED)
+    root.after(ARTICLE_HANDOFF_POLL_MS, show_next_article_when_ready)
+
+# Function to leave the loading message. Waiting is not reading time, so the clock for
+# the article shown next starts now.
+def end_stall():
+    global waiting_for_articles, last_scroll_time
+    waiting_for_articles = False
+    prefetch.stall_ended()
+    last_scroll_time = time.time()
+
+# Function to move on to the next article once it is in the feed, on the Tk thread
+def show_next_article_when_ready():
+    global current_abstract_index
+    if not waiting_for_articles:
+        return
+    if current_abstract_index < len(abstracts) - 1:
+        end_stall()
+        current_abstract_index += 1
+        display_abstract(current_abstract_index)
+    elif articles_pending():
+        root.after(ARTICLE_HANDOFF_POLL_MS, show_next_article_when_ready)
+    else:
+        end_stall()
+        logger.warning("No more articles to display.")
+        display_abstract(current_abstract_index)
+
+# Modify the scroll function to move through the feed. Displaying an article marks it
+# seen, which refills the feed when it runs low.
 def on_scroll(event):
-    global current_abstract_index, last_seen_index
+    global current_abstract_index
+
+    if waiting_for_articles:
+        # Scrolling up from the loading message goes back to the article it was on
+        if event.num == 4 or event.delta > 0:
+            end_stall()
+            display_abstract(current_abstract_index)
+        return
 
     if event.num == 5 or event.delta < 0:  # Scroll down (next abstract)
         if current_abstract_index < len(abstracts) - 1:
             current_abstract_index += 1
-
-            # Load more articles if scrolled 5 and number of unseen < 50
-            num_unseen_abstracts = len(abstracts) - last_seen_index - 1
-            if current_abstract_index % 5 == 0 and num_unseen_abstracts < MAX_UNSEEN_FILES_LOADED_IN:
-                threading.Thread(target=load_more_articles_and_rank, daemon=True).start()
-
+        elif articles_pending() and not loading:
+            wait_for_next_article()
+            return
         else:
             logger.warning("No more articles to display.")
 
@@ -217,32 +232,99 @@ def on_scroll(event):
 
     # Display the new abstract
     display_abstract(current_abstract_index)
-    if current_abstract_index > last_seen_index:
-        last_seen_index = current_abstract_index
 
-# Background thread function to scrape abstracts
+# Function to remember the articles in the feed so the scraper does not fetch them again
+def remember_article_keys(articles):
+    for article in articles:
+        seen_article_keys.add(article_key(article['url']))
+
+# Function used by the scraper to skip articles already in the feed, or shown in an
+# earlier session, before fetching them
+def is_article_seen(key):
+    return key in seen_article_keys or key in get_seen_filter()
+
+# Function used by the scraper to check whether score_cards can score anything, so
+# batches do not harvest extra listing pages while there is no saved corpus
+def can_score_cards():
+    return bool(saved_abstracts)
+
+# Function used by the scraper to score listing cards by the similarity of their title and
+# summary to the saved corpus, so only the most promising article pages are fetched
+def score_cards(cards):
+    if not can_score_cards():
+        return None
+    return similarity_to_saved_corpus([card['title'] + " " + card.get('summary', "") for card in cards], saved_abstracts)
+
+# Function to take new articles from the article store if crawler.py is filling it
+# (empty list if it is not), so they do not have to be scraped while the user waits
+def take_stored_articles(num_articles):
+    if not crawler_is_running():
+        return []
+    return take_articles(num_articles, is_seen=lambda url: is_article_seen(article_key(url)))
+
+# Background thread function to scrape abstracts. Articles are handed to the Tk thread
+# through incoming_articles one by one as they are scraped, followed by None when done.
 def background_task():
-    global abstracts, saved_abstracts, loading_more_articles
     logger.info("Starting background scrape task...")
-    loading_more_articles = True
-    abstracts = scrape_random_sample()
-    if abstracts:
+    num_scraped = 0
+    # Scrape here only if the crawler is not running or has nothing stored yet
+    articles = take_stored_articles(10) or iter_random_sample(token=shutdown_token)
+    for article in articles:
+        remember_article_keys([article])
+        incoming_articles.put(article)
+        num_scraped += 1
+    if num_scraped:
         logger.info("Abstracts scraped successfully!")
     else:
         logger.warning("Failed to scrape abstracts.")
-   
-    loading_more_articles = False
-    # Update the UI after fetching abstracts
-    root.after(0, on_loading_complete)
+
+    incoming_articles.put(None)
+    # Hold the refills queued behind this one until the Tk thread has put the articles
+    # in the feed, so they rank them instead of dropping them
+    while not cold_start_handed_off.wait(ARTICLE_HANDOFF_POLL_MS / 1000) and not shutdown_token.cancelled:
+        pass
+
+# Function to move articles scraped by background_task into the feed, on the Tk thread.
+# The first one ends the loading screen, the rest are appended as they arrive.
+def take_incoming_articles():
+    finished = False
+    while True:
+        try:
+            article = incoming_articles.get_nowait()
+        except queue.Empty:
+            break
+        if article is None:
+            finished = True
+            break
+        abstracts.append(article)
+        if loading:
+            on_loading_complete()
+
+    if finished:
+        cold_start_handed_off.set()
+        if loading:
+            on_loading_complete()
+    else:
+        root.after(ARTICLE_HANDOFF_POLL_MS, take_incoming_articles)
+
+# Background thread function to resolve nature.com and open pooled connections to it while
+# the window is being built. What that saved the first request is recorded on exit.
+def warm_up_task():
+    warm_up_connections()
 
 # Function to handle loading completion
 def on_loading_complete():
-    global loading
+    global loading, last_scroll_time
     loading = False
+    # Startup is not reading time, the clock for the first article starts now
+    last_scroll_time = time.time()
     logger.info("Loading complete. Displaying first abstract...")
     display_abstract(current_abstract_index)  # Display the first abstract
     loading_label.pack_forget()  # Remove the loading label
     abstract_label.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)  # Show the abstract label
+    if 'first_paint' not in startup_timings:
+        startup_timings['first_paint'] = time.time() - app_start_time
+        logger.info("Time to first paint: %.2f s", startup_timings['first_paint'])
 
 # Function to update the loading spinner
 def update_loading_spinner():
@@ -257,28 +339,40 @@ def update_loading_spinner():
     if loading:
         root.after(500, update_loading_spinner)
 
+# Function the feed calls from a background thread when it runs low
+def refill_feed(num_articles):
+    refills.run(load_more_articles_and_rank, num_articles)
+
 # Start the background task
 def start_loading():
     global loading
     loading = True
     logger.info("Starting loading spinner and background scraping...")
-    threading.Thread(target=background_task, daemon=True).start()  # Start in the background
+    threading.Thread(target=refills.run, args=(background_task,), daemon=True).start()  # Start in the background
     update_loading_spinner()
+    root.after(ARTICLE_HANDOFF_POLL_MS, take_incoming_articles)
 
-# Function to dynamically load and rank more articles
-def load_more_articles_and_rank(num_articles=10):
-    global abstracts, saved_abstracts, seen_titles, loading_more_articles, current_abstract_index, last_seen_index
-    if loading_more_articles:
-        logger.warning("Already loading more articles, skipping new thread.")
-        return
-
-    loading_more_articles = True  # Set the flag
+# Function to dynamically load and rank more articles. Background refills go through
+# refills, so they never overlap, and scrape with shutdown_token, so they stop when
+# the app exits.
+def load_more_articles_and_rank(num_articles=FEED_REFILL_SIZE, token=None):
+    global saved_abstracts, seen_titles, seen_article_keys
     logger.info("Loading more articles...")
+    token = token or shutdown_token
     try:
-        new_articles = scrape_random_sample(num_articles)
+        # With the crawler running the store is the only source, no network calls are made here
+        if crawler_is_running():
+            new_articles = take_stored_articles(num_articles)
+        else:
+            new_articles = scrape_random_sample(num_articles, token=token)
 
-        # Get unseen articles from the abstracts list after the current index
-        unseen_existing_articles = abstracts[last_seen_index + 1:]
+        # Cancelled by the exit, which tops up the feed itself
+        if token is shutdown_token and shutdown_token.cancelled:
+            logger.info("Loading more articles was cancelled.")
+            return
+
+        # Get unseen articles from the feed, after the last one seen
+        unseen_existing_articles = abstracts.unseen()
         '''
         unseen_existing_articles = [
             article for article in abstracts[last_seen_index + 1:]
@@ -303,21 +397,19 @@ def load_more_articles_and_rank(num_articles=10):
         # Add titles of combined articles to seen set
         for article in combined_articles:
             seen_titles.add(article['title'])
+        remember_article_keys(combined_articles)
 
         # Rank the combined articles against the saved corpus
         ranked_articles = rank_articles_by_similarity_with_saved_corpus(combined_articles, saved_abstracts)
 
-        # Replace abstracts list with seen articles up to the current index,
-
-        # then add ranked unseen articles
-        abstracts = abstracts[:last_seen_index + 1] + ranked_articles
+        # Swap the ranked articles in after the seen ones, in one step so the Tk
+        # thread never sees a half-built feed
+        abstracts.replace_unseen(ranked_articles)
 
         logger.info("Re-ranked %s articles, combining unseen and new.", len(ranked_articles))
     except Exception as e:
         raise(e)
         logger.warning("Error while loading and ranking more articles: %s", e)
-    finally:
-        loading_more_articles = False  # Reset the flag
 
 def load_saved_abstracts_json(directory="saved_abstracts"):
     saved_abstracts = []
@@ -413,23 +505,21 @@ def save_next_articles(articles):
 
 # Modify the exit function to preload articles
 def save_next_and_exit():
-    global abstracts, current_abstract_index, last_seen_index
-    while loading_more_articles:
-        time.sleep(0.5)
+    # Cancel the background scrapes and give them SHUTDOWN_GRACE seconds to stop.
+    # A scrape still stuck in a socket read after that will not touch the feed.
+    shutdown_token.cancel()
+    refills.wait_idle(SHUTDOWN_GRACE)
     logger.debug("No longer loading more articles normally. Loading for preload now.")
-    num_remaining_articles = len(abstracts) - last_seen_index - 1
+    num_remaining_articles = abstracts.num_unseen
     if (num_remaining_articles < NUM_FILES_TO_SAVE_TO_PRELOAD):
         logger.debug("Stats before:")
-        logger.debug("Last seen index: %s", last_seen_index)
+        logger.debug("Last seen index: %s", abstracts.last_seen_index)
         logger.debug("length of abstracts list: %s", len(abstracts))
         logger.debug("Number of remaining articles: %s", num_remaining_articles)
-        last_seen_index = len(abstracts) - 1 # to make load_more_articles_and_rank work
-        load_more_articles_and_rank(NUM_FILES_TO_SAVE_TO_PRELOAD - num_remaining_articles)
-        save_next_articles(abstracts[-NUM_FILES_TO_SAVE_TO_PRELOAD:])
-    else:
-        save_next_articles(abstracts[last_seen_index + 1: last_seen_index + NUM_FILES_TO_SAVE_TO_PRELOAD + 1])
+        load_more_articles_and_rank(NUM_FILES_TO_SAVE_TO_PRELOAD - num_remaining_articles, token=CancelToken(EXIT_PRELOAD_DEADLINE))
+    save_next_articles(abstracts.unseen()[:NUM_FILES_TO_SAVE_TO_PRELOAD])
     logger.debug("Stats after:")
-    logger.debug("Last seen index: %s", last_seen_index)
+    logger.debug("Last seen index: %s", abstracts.last_seen_index)
     logger.debug("length of abstracts list: %s", len(abstracts))
     logger.debug("Number of remaining articles: %s", num_remaining_articles)
     logger.info("Program exiting.")
@@ -439,6 +529,7 @@ def save_next_and_exit():
 def cleanup():
     save_top_abstracts_json(abstracts)
     save_next_and_exit()
+    get_seen_filter().flush()
    
     print("\n")
     logger.info("Final Abstracts and Scores:")
@@ -451,6 +542,15 @@ def cleanup():
         logger.info("URL: %s", article['url'])
         print("-" * 80)
 
+    # The connection set-up time the warm-up saved the first request (0 if that request got no warmed connection)
+    scraper_stats = get_scraper_stats()
+    if "warm_up_seconds_saved" in scraper_stats:
+        startup_timings['connection_warm_up_saved'] = round(scraper_stats["warm_up_seconds_saved"], 3)
+    logger.info("Startup timings: %s", startup_timings)
+    logger.info("Refills run: %s, joined: %s", refills.calls_started, refills.calls_joined)
+    logger.info("Feed metrics: %s", abstracts.metrics())
+    logger.info("Scraper stats: %s", get_scraper_stats())
+
 # Register the function to run when the program exits
 atexit.register(cleanup)
 
@@ -458,16 +558,34 @@ atexit.register(cleanup)
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Fork the html parsing processes now, before Tk and the scraping threads start
+start_parse_workers()
+
 # Initialize variables at the top of the script
 current_abstract_index = 0
-last_seen_index = 0
-abstracts = []
+displayed_index = None   # index of the article on screen, None while there is none
+waiting_for_articles = False
+# Decides when the feed refills, from the user's reading speed and the refill latency
+prefetch = PrefetchScheduler(PREFETCH_MARGIN, PREFETCH_INITIAL_DWELL, PREFETCH_INITIAL_LATENCY, PREFETCH_MAX_DWELL)
+# The feed. Built ahead of the window, so the exit handler finds it if the app fails to start.
+abstracts = FeedBuffer(refill_feed, FEED_LOW_WATERMARK, MAX_UNSEEN_FILES_LOADED_IN, FEED_REFILL_SIZE, scheduler=prefetch)
 saved_abstracts = []
 last_scroll_time = time.time()
 loading = False
-# Global flag to track if a scraping thread is running
-loading_more_articles = False
+# Runs the background scrapes one at a time, coalescing the refills requested meanwhile
+refills = SingleFlight()
 seen_titles = set()
+seen_article_keys = set()
+# Articles scraped on the cold start, waiting for the Tk thread
+incoming_articles = queue.Queue()
+cold_start_handed_off = threading.Event()
+startup_timings = {}
+# Cancelled on exit to stop the background scrapes
+shutdown_token = CancelToken()
+
+# With the crawler filling the article store the app makes no requests, so there is nothing to warm up
+if not crawler_is_running():
+    threading.Thread(target=warm_up_task, daemon=True).start()
 
 # Set up the main window
 root = tk.Tk()
@@ -510,14 +628,21 @@ bind_scroll_events()
 
 
 # Load preloaded articles and start the scraping process
-abstracts = load_preloaded_articles()
+abstracts.extend(load_preloaded_articles())
 saved_abstracts = load_saved_abstracts_json()
+remember_article_keys(abstracts)
+set_seen_check(is_article_seen)
+set_candidate_scorer(score_cards, can_score_cards)
 if not abstracts:
     logger.warning("No preloaded articles found. Starting fresh scrape...")
-    threading.Thread(target=background_task, daemon=True).start()
+    start_loading()
 else:
     logger.info("Preloaded articles ready. Starting background scrape for more...")
     on_loading_complete()
 
 # Start the main loop of the Tkinter GUI
 root.mainloop()
+
+# The window is closed. Cancel the background scrapes now, before Python waits for
+# their threads to finish on the way out.
+shutdown_token.cancel()
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import logging
+
+# Local store of scraped articles, filled by crawler.py and read by the GUI
+ARTICLE_STORE_DIRECTORY = "article_store"
+ARTICLE_STORE_MAX_ARTICLES = 300            # the crawler stops adding articles past this many
+ARTICLE_STORE_MAX_BYTES = 5 * 1024 * 1024   # or past this much disk space
+CRAWLER_HEARTBEAT_FILE = os.path.join(ARTICLE_STORE_DIRECTORY, "crawler_heartbeat.json")
+CRAWLER_HEARTBEAT_TIMEOUT = 90  # in seconds, a crawler that has not checked in for this long is taken as stopped
+
+logger = logging.getLogger(__name__)
+
+def _article_path(key):
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(ARTICLE_STORE_DIRECTORY, name + ".json")
+
+def _article_entries():
+    try:
+        return [entry for entry in os.scandir(ARTICLE_STORE_DIRECTORY)
+                if entry.name.endswith(".json") and entry.path != CRAWLER_HEARTBEAT_FILE]
+    except FileNotFoundError:
+        return []
+
+# Function to check whether the store holds the article with this key
+def has_article(key):
+    return os.path.exists(_article_path(key))
+
+# Function to add an article to the store. The file is written under a temporary name
+# and renamed into place, so a reader never sees half an article.
+def store_article(key, article):
+    path = _article_path(key)
+    temp_path = path + ".tmp"
+    if not os.path.exists(ARTICLE_STORE_DIRECTORY):
+        os.makedirs(ARTICLE_STORE_DIRECTORY)
+    with open(temp_path, "w") as file:
+        json.dump(article, file)
+    os.replace(temp_path, path)
+
+# Function to get the number of articles in the store and the disk space they take
+def store_size():
+    num_articles = 0
+    num_bytes = 0
+    for entry in _article_entries():
+        try:
+            num_bytes += entry.stat().st_size
+        except FileNotFoundError:
+            continue
+        num_articles += 1
+    return num_articles, num_bytes
+
+# Function to check whether the store is at its article or disk budget
+def store_is_full():
+    num_articles, num_bytes = store_size()
+    return num_articles >= ARTICLE_STORE_MAX_ARTICLES or num_bytes >= ARTICLE_STORE_MAX_BYTES
+
+# Function to take up to max_articles articles out of the store, oldest first. Taken
+# articles are removed from the store, and ones is_seen(url) reports are dropped.
+def take_articles(max_articles, is_seen=None):
+    entries = []
+    for entry in _article_entries():
+        try:
+            entries.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+
+    articles = []
+    for _, path in sorted(entries):
+        if len(articles) >= max_articles:
+            break
+        try:
+            with open(path, "r") as file:
+                article = json.load(file)
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Error reading %s from the article store: %s", path, e)
+            continue
+        if is_seen is None or not is_seen(article['url']):
+            articles.append(article)
+    logger.info("Took %s articles from the article store.", len(articles))
+    return articles
+
+# Function for the crawler to record that it is still running
+def write_heartbeat(stats=None):
+    if not os.path.exists(ARTICLE_STORE_DIRECTORY):
+        os.makedirs(ARTICLE_STORE_DIRECTORY)
+    temp_path = CRAWLER_HEARTBEAT_FILE + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump({"pid": os.getpid(), "time": time.time(), "stats": stats or {}}, file)
+    os.replace(temp_path, CRAWLER_HEARTBEAT_FILE)
+
+# Function for the crawler to record that it has stopped
+def clear_heartbeat():
+    try:
+        os.remove(CRAWLER_HEARTBEAT_FILE)
+    except FileNotFoundError:
+        pass
+
+# Function to check whether a crawler is filling the store (its heartbeat is recent)
+def crawler_is_running():
+    try:
+        return time.time() - os.path.getmtime(CRAWLER_HEARTBEAT_FILE) < CRAWLER_HEARTBEAT_TIMEOUT
+    except OSError:
+        return False
@@ -0,0 +1,82 @@
+import time
+import logging
+import threading
+from scraper import iter_random_sample, get_scraper_stats, set_seen_check, set_rate_limit, article_key, start_parse_workers
+from seenFilter import get_seen_filter
+from articleStore import store_article, has_article, store_is_full, store_size, write_heartbeat, clear_heartbeat, crawler_is_running
+
+# Long-running crawler that keeps the article store topped up, so the GUI can read
+# new articles from disk instead of scraping them while the user waits.
+# Run it next to the GUI with: python crawler.py
+CRAWL_BATCH_SIZE = 10
+CRAWL_RATE_LIMIT_PER_SECOND = 1.0   # requests per second, well below the GUI's own budget
+CRAWL_IDLE_INTERVAL = 30            # in seconds, how long to wait while the store is full
+CRAWL_ERROR_INTERVAL = 60           # in seconds, how long to wait after a batch that scraped nothing
+HEARTBEAT_INTERVAL = 15             # in seconds, must stay well below CRAWLER_HEARTBEAT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Articles stored during this run. The GUI removes articles from the store when it
+# takes them, so the store alone cannot tell us not to crawl them again.
+crawled_keys = set()
+
+# Function used by the scraper to skip articles that are already stored, were
+# crawled earlier in this run, or were shown to the user in an earlier session
+def is_article_known(key):
+    return key in crawled_keys or has_article(key) or key in get_seen_filter()
+
+# Function for the heartbeat thread to check in every HEARTBEAT_INTERVAL seconds until
+# stopped is set. It runs apart from the crawl, so a batch held up by slow fetches or a
+# long Retry-After does not make the GUI take the crawler for stopped.
+def beat(stopped):
+    while not stopped.wait(HEARTBEAT_INTERVAL):
+        try:
+            write_heartbeat(get_scraper_stats())
+        except OSError as e:
+            logger.warning("Error writing the crawler heartbeat: %s", e)
+
+# Function to scrape one batch of articles into the store. Returns how many were stored.
+def crawl_batch():
+    num_stored = 0
+    for article in iter_random_sample(CRAWL_BATCH_SIZE):
+        key = article_key(article['url'])
+        crawled_keys.add(key)
+        store_article(key, article)
+        num_stored += 1
+    return num_stored
+
+def crawl():
+    while True:
+        if store_is_full():
+            time.sleep(CRAWL_IDLE_INTERVAL)
+            continue
+        num_stored = crawl_batch()
+        num_articles, num_bytes = store_size()
+        logger.info("Stored %s articles, the store has %s articles (%s bytes).", num_stored, num_articles, num_bytes)
+        if not num_stored:
+            time.sleep(CRAWL_ERROR_INTERVAL)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if crawler_is_running():
+        logger.warning("Another crawler is already filling the article store. Exiting.")
+        raise SystemExit(1)
+
+    start_parse_workers()
+    set_rate_limit(CRAWL_RATE_LIMIT_PER_SECOND)
+    set_seen_check(is_article_known)
+    write_heartbeat()
+    heartbeat_stopped = threading.Event()
+    heartbeat_thread = threading.Thread(target=beat, args=(heartbeat_stopped,), daemon=True)
+    heartbeat_thread.start()
+    logger.info("Crawler started.")
+    try:
+        crawl()
+    except KeyboardInterrupt:
+        logger.info("Crawler stopped.")
+    finally:
+        # Stop the heartbeat before clearing it, so it is not written again afterwards
+        heartbeat_stopped.set()
+        heartbeat_thread.join()
+        clear_heartbeat()
+        logger.info("Scraper stats: %s", get_scraper_stats())
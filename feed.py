@@ -0,0 +1,298 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """One call made by a SingleFlight, with the result every caller waiting on it gets."""
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """Coalesces calls that would otherwise run at the same time, like feed refills
+    started by several scroll events. Only one call is ever in flight. A caller that
+    arrives while a call is running queues one more call to run after it, since the
+    running call may have started before the caller's need arose, and waits for that
+    one. Every other caller arriving meanwhile joins the queued call instead of adding
+    another, and gets its result. No call is dropped, and no two calls overlap."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._running = None
+        self._queued = None
+        self.calls_started = 0
+        self.calls_joined = 0
+
+    # Function to call function(*args, **kwargs), or join the call queued behind the one
+    # in flight. Returns the result of the call that ran (raises its exception).
+    def run(self, function, *args, **kwargs):
+        with self._lock:
+            if self._queued is not None:
+                flight = self._queued
+                self.calls_joined += 1
+                logger.debug("Joining the queued call to %s.", flight.function.__name__)
+                run_it = False
+            elif self._running is not None:
+                # Queue one call behind the one in flight, and run it once that has finished
+                flight = self._queued = _Flight(function, args, kwargs)
+                while self._running is not None:
+                    self._idle.wait()
+                self._running = flight
+                self._queued = None
+                run_it = True
+            else:
+                flight = self._running = _Flight(function, args, kwargs)
+                run_it = True
+        if not run_it:
+            return flight.wait()
+
+        try:
+            flight.result = function(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._running = None
+                self.calls_started += 1
+                self._idle.notify_all()
+            flight.done.set()
+        return flight.wait()
+
+    # Function to check whether a call is running or queued
+    @property
+    def busy(self):
+        with self._lock:
+            return self._running is not None or self._queued is not None
+
+    # Function to wait until no call is running or queued, for at most timeout seconds.
+    # Returns whether that happened in time.
+    def wait_idle(self, timeout=None):
+        with self._lock:
+            return self._idle.wait_for(lambda: self._running is None and self._queued is None, timeout)
+
+class FeedBuffer:
+    """Thread-safe feed of articles: the ones already shown, which the user can scroll
+    back to, followed by the unseen ones waiting to be shown. Marking an article seen
+    starts a refill on a background thread when fewer than low_watermark unseen
+    articles are left. A refill asks for at most batch_size articles and never for
+    more than would take the buffer past high_watermark, and only one runs at a time.
+    With a PrefetchScheduler, a refill also starts when the scheduler expects the unseen
+    articles to run out before a refill could land, so low_watermark is only a floor.
+    Refills hand back their re-ranked unseen articles with replace_unseen, which swaps
+    them in atomically, keeping articles that arrived while they were ranking."""
+
+    def __init__(self, refill, low_watermark, high_watermark, batch_size, articles=(), scheduler=None):
+        self._refill = refill
+        self.scheduler = scheduler
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._articles = list(articles)
+        self._last_seen_index = 0
+        self._refilling = False
+        self.refills_started = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._articles)
+
+    def __getitem__(self, index):
+        with self._lock:
+            return self._articles[index]
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._articles))
+
+    def append(self, article):
+        with self._lock:
+            self._articles.append(article)
+
+    def extend(self, articles):
+        with self._lock:
+            self._articles.extend(articles)
+
+    @property
+    def last_seen_index(self):
+        with self._lock:
+            return self._last_seen_index
+
+    # Function to get the number of articles after the last one seen (hold _lock)
+    def _num_unseen(self):
+        return max(0, len(self._articles) - self._last_seen_index - 1)
+
+    @property
+    def num_unseen(self):
+        with self._lock:
+            return self._num_unseen()
+
+    @property
+    def refill_pending(self):
+        with self._lock:
+            return self._refilling
+
+    # Function to get a copy of the unseen articles, in feed order
+    def unseen(self):
+        with self._lock:
+            return self._articles[self._last_seen_index + 1:]
+
+    # Function to record that the article at index has been shown, refilling the
+    # buffer if that leaves it below the low watermark
+    def mark_seen(self, index):
+        with self._lock:
+            self._last_seen_index = max(self._last_seen_index, min(index, len(self._articles) - 1))
+        self.refill_if_low()
+
+    # Function to check whether the buffer is running low (hold _lock)
+    def _is_low(self, num_unseen):
+        if num_unseen < self.low_watermark:
+            return True
+        return self.scheduler is not None and self.scheduler.should_refill(num_unseen)
+
+    # Function to start a refill if the buffer is running low and none is running
+    def refill_if_low(self):
+        with self._lock:
+            num_unseen = self._num_unseen()
+            num_wanted = min(self.batch_size, self.high_watermark - num_unseen)
+            if self._refilling or num_wanted <= 0 or not self._is_low(num_unseen):
+                return False
+            self._refilling = True
+            self.refills_started += 1
+            if self.scheduler is not None:
+                self.scheduler.refill_started(num_unseen)
+        logger.info("Feed is down to %s unseen articles, refilling %s.", num_unseen, num_wanted)
+        threading.Thread(target=self._run_refill, args=(num_wanted,), daemon=True).start()
+        return True
+
+    def _run_refill(self, num_wanted):
+        try:
+            self._refill(num_wanted)
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.refill_finished()
+            with self._lock:
+                self._refilling = False
+
+    # Function to get the buffer depth, with the scheduler's metrics if there is one
+    def metrics(self):
+        with self._lock:
+            metrics = {"buffer_depth": self._num_unseen(), "refills_started": self.refills_started}
+        if self.scheduler is not None:
+            metrics.update(self.scheduler.metrics(metrics["buffer_depth"]))
+        return metrics
+
+    # Function to replace the unseen articles with a re-ranked list of them (and new ones).
+    # Articles seen in the meantime are left where they are, articles appended in the
+    # meantime are kept after the ranked ones, and the result is capped at the high watermark.
+    def replace_unseen(self, ranked_articles):
+        with self._lock:
+            seen = self._articles[:self._last_seen_index + 1]
+            seen_ids = {id(article) for article in seen}
+            ranked = [article for article in ranked_articles if id(article) not in seen_ids]
+            ranked_ids = {id(article) for article in ranked}
+            arrived = [article for article in self._articles[self._last_seen_index + 1:] if id(article) not in ranked_ids]
+            self._articles = seen + (ranked + arrived)[:self.high_watermark]
+
+class PrefetchScheduler:
+    """Decides when a FeedBuffer should refill from how fast the user reads. It keeps
+    moving averages of the time spent on each article (the inverse of the scroll
+    velocity) and of how long refills take to land, and asks for a refill once the
+    unseen articles hold less reading time than a refill takes plus margin seconds.
+    Fast skimmers get refills early, slow readers do not fetch articles they will
+    not reach. It also counts stalls, times the user reached the end of the feed and
+    had to wait for a refill."""
+
+    def __init__(self, margin, initial_dwell, initial_latency, max_dwell, smoothing=0.3):
+        self.margin = margin
+        self.max_dwell = max_dwell
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._dwell = initial_dwell
+        self._latency = initial_latency
+        self._refill_started_at = None
+        self._content_at_refill_start = None
+        self._stall_started_at = None
+        self.last_lead_time = None
+        self.min_lead_time = None
+        self.stalls = 0
+        self.stall_seconds = 0.0
+
+    def _smooth(self, average, value):
+        return average + self.smoothing * (value - average)
+
+    # Function to record the time spent on an article, capped at max_dwell so a user
+    # who walked away does not look like a slow reader
+    def record_view(self, seconds):
+        with self._lock:
+            self._dwell = self._smooth(self._dwell, min(max(seconds, 0.0), self.max_dwell))
+
+    # Function to estimate the seconds of reading left in num_unseen articles
+    def seconds_remaining(self, num_unseen):
+        with self._lock:
+            return num_unseen * self._dwell
+
+    # Function to check whether a refill started now would land after the user runs out
+    def should_refill(self, num_unseen):
+        with self._lock:
+            return num_unseen * self._dwell < self._latency + self.margin
+
+    # Functions for the FeedBuffer to record when a refill starts and lands. The lead
+    # time is how long before the unseen articles were expected to run out it landed.
+    def refill_started(self, num_unseen):
+        with self._lock:
+            self._refill_started_at = time.monotonic()
+            self._content_at_refill_start = num_unseen * self._dwell
+
+    def refill_finished(self):
+        with self._lock:
+            if self._refill_started_at is None:
+                return
+            latency = time.monotonic() - self._refill_started_at
+            self._latency = self._smooth(self._latency, latency)
+            self.last_lead_time = self._content_at_refill_start - latency
+            if self.min_lead_time is None or self.last_lead_time < self.min_lead_time:
+                self.min_lead_time = self.last_lead_time
+            self._refill_started_at = None
+
+    # Functions for the GUI to record when the user reaches the end of the feed while a
+    # refill is on its way, and when the next article is shown
+    def stall_started(self):
+        with self._lock:
+            if self._stall_started_at is None:
+                self._stall_started_at = time.monotonic()
+                self.stalls += 1
+
+    def stall_ended(self):
+        with self._lock:
+            if self._stall_started_at is not None:
+                self.stall_seconds += time.monotonic() - self._stall_started_at
+                self._stall_started_at = None
+
+    # Function to get the scheduler's estimates and counters, for logging
+    def metrics(self, num_unseen):
+        with self._lock:
+            return {
+                "seconds_remaining": round(num_unseen * self._dwell, 1),
+                "dwell_estimate": round(self._dwell, 2),
+                "articles_per_minute": round(60 / self._dwell, 1) if self._dwell > 0 else None,
+                "refill_latency_estimate": round(self._latency, 2),
+                "last_lead_time": None if self.last_lead_time is None else round(self.last_lead_time, 2),
+                "min_lead_time": None if self.min_lead_time is None else round(self.min_lead_time, 2),
+                "stalls": self.stalls,
+                "stall_seconds": round(self.stall_seconds, 2),
+            }
@@ -0,0 +1,92 @@
+import sys
+import os
+import glob
+import time
+import resource
+import tracemalloc
+import statistics
+import multiprocessing
+import parsers
+import scraper
+
+# Microbenchmark of the HTML parser backends in parsers.py over saved Nature pages.
+#   python parseBenchmark.py --save [NUM_PAGES]   download fixture pages
+#   python parseBenchmark.py [NUM_RUNS]           time every available backend
+FIXTURE_DIRECTORY = "fixtures"
+NUM_RUNS = 20
+
+# Function to save listing pages and one article page from each as fixtures
+def save_fixtures(num_pages=3):
+    if not os.path.exists(FIXTURE_DIRECTORY):
+        os.makedirs(FIXTURE_DIRECTORY)
+    for page_number in range(1, num_pages + 1):
+        url = f"{scraper.NATURE_BASE_URL}/nature/research-articles?searchType=journalSearch&sort=PubDate&page={page_number}"
+        listing_html = scraper.fetch(url).text
+        with open(os.path.join(FIXTURE_DIRECTORY, f"listing_{page_number}.html"), "w") as file:
+            file.write(listing_html)
+
+        cards = parsers.parse_listing_cards(listing_html, scraper.NATURE_BASE_URL)
+        if cards:
+            with open(os.path.join(FIXTURE_DIRECTORY, f"article_{page_number}.html"), "w") as file:
+                file.write(scraper.fetch(cards[0]["url"]).text)
+        print(f"Saved fixtures for listing page {page_number}")
+
+def load_fixtures(prefix):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIRECTORY, prefix + "_*.html"))):
+        with open(path, "r") as file:
+            pages.append(file.read())
+    return pages
+
+# Function to time one backend and measure its peak memory. Runs in its own process
+# so the RSS growth of C parsers (lxml, selectolax) is not hidden by earlier runs.
+def benchmark_backend(backend, num_runs, results):
+    listing_pages = load_fixtures("listing")
+    article_pages = load_fixtures("article")
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    timings = {"listing": [], "article": []}
+    for _ in range(num_runs):
+        for kind, pages, parse in [("listing", listing_pages, parsers.parse_listing_cards),
+                                   ("article", article_pages, parsers.parse_abstract)]:
+            for html in pages:
+                start = time.perf_counter()
+                parse(html, backend=backend)
+                timings[kind].append(time.perf_counter() - start)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    results[backend] = {
+        "listing_ms": statistics.median(timings["listing"]) * 1000 if timings["listing"] else 0,
+        "article_ms": statistics.median(timings["article"]) * 1000 if timings["article"] else 0,
+        "python_peak_kb": python_peak / 1024,
+        "rss_growth_kb": rss_growth,
+    }
+
+def run_benchmark(num_runs=NUM_RUNS):
+    num_listing = len(load_fixtures("listing"))
+    num_article = len(load_fixtures("article"))
+    if not num_listing and not num_article:
+        print(f"No fixture pages in {FIXTURE_DIRECTORY}/, run with --save first.")
+        return
+    print(f"{num_listing} listing and {num_article} article fixtures, {num_runs} runs each")
+
+    manager = multiprocessing.Manager()
+    results = manager.dict()
+    for backend in parsers.available_backends():
+        process = multiprocessing.Process(target=benchmark_backend, args=(backend, num_runs, results))
+        process.start()
+        process.join()
+
+    print(f"{'backend':<12} {'listing ms':>11} {'article ms':>11} {'py peak KB':>11} {'RSS +KB':>9}")
+    for backend, result in results.items():
+        print(f"{backend:<12} {result['listing_ms']:>11.2f} {result['article_ms']:>11.2f} "
+              f"{result['python_peak_kb']:>11.0f} {result['rss_growth_kb']:>9}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--save":
+        save_fixtures(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else NUM_RUNS)
@@ -0,0 +1,224 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from html.parser import HTMLParser
+import logging
+import re
+import codecs
+
+# "html.parser" (stdlib), "lxml" or "selectolax". The last two are optional
+# dependencies; if the configured one is not installed html.parser is used.
+HTML_PARSER_BACKEND = "html.parser"
+
+LISTING_CARD_CLASS = 'u-full-height c-card c-card--flush'
+CARD_SUMMARY_CLASS = 'c-card__summary'
+ABSTRACT_SECTION_CLASS = 'c-article-section__content'
+# <meta> tags in <head> that carry the abstract and title, in order of preference
+ABSTRACT_META_NAMES = ["dc.description", "citation_abstract", "og:description"]
+TITLE_META_NAMES = ["citation_title", "dc.title", "og:title"]
+USE_HEAD_META_ABSTRACT = True   # take the abstract from <head> and only fall back to the abstract section
+
+_HEAD_END = re.compile(r"</head\s*>", re.IGNORECASE)
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE)
+CHARSET_SNIFF_BYTES = 2048
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAVE_SELECTOLAX = True
+except ImportError:
+    HAVE_SELECTOLAX = False
+
+_warned_backends = set()
+
+def _known_charset(charset):
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+# Function to find the charset of a page from its Content-Type header, or failing that
+# from a <meta> charset declaration at the top of the page (None if neither has one)
+def find_charset(content_type, head_bytes):
+    for parameter in (content_type or "").split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset":
+            charset = _known_charset(value.strip().strip("\"'"))
+            if charset:
+                return charset
+    match = _META_CHARSET.search(head_bytes[:CHARSET_SNIFF_BYTES])
+    if match:
+        return _known_charset(match.group(1).decode("ascii"))
+    return None
+
+# Function to decode a page with its declared charset, or as UTF-8, without the charset
+# detection requests and bs4 fall back to when no charset is declared
+def decode_html(content, content_type=None):
+    charset = find_charset(content_type, content)
+    if charset:
+        return content.decode(charset, errors="replace")
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content.decode("windows-1252", errors="replace")
+
+# Function to list the parser backends that can be used in this environment
+def available_backends():
+    backends = ["html.parser"]
+    if HAVE_LXML:
+        backends.append("lxml")
+    if HAVE_SELECTOLAX:
+        backends.append("selectolax")
+    return backends
+
+def _resolve_backend(backend):
+    backend = backend or HTML_PARSER_BACKEND
+    if backend in available_backends():
+        return backend
+    if backend not in _warned_backends:
+        _warned_backends.add(backend)
+        logger.warning("HTML parser backend %s is not available, using html.parser.", backend)
+    return "html.parser"
+
+# Function to extract {"title", "url", "summary"} for every card on a listing page (the
+# summary is "" on cards without one). Only the card <article> elements are built into
+# a tree, the rest of the page is skipped.
+def parse_listing_cards(html, base_url="", backend=None):
+    backend = _resolve_backend(backend)
+    cards = []
+    if backend == "selectolax":
+        tree = LexborHTMLParser(html)
+        selector = "article." + ".".join(LISTING_CARD_CLASS.split())
+        for article in tree.css(selector):
+            title = article.css_first("h3.c-card__title").text(deep=True, separator="", strip=True)
+            href = article.css_first("a").attributes["href"]
+            summary = article.css_first("div." + CARD_SUMMARY_CLASS)
+            summary = summary.text(deep=True, separator=" ", strip=True) if summary is not None else ""
+            cards.append({"title": title, "url": base_url + href, "summary": summary})
+        return cards
+
+    strainer = SoupStrainer('article', class_=LISTING_CARD_CLASS)
+    soup = BeautifulSoup(html, backend, parse_only=strainer)
+    for article in soup.find_all('article', class_=LISTING_CARD_CLASS):
+        title = article.find('h3', class_='c-card__title').get_text(strip=True)
+        summary = article.find('div', class_=CARD_SUMMARY_CLASS)
+        summary = summary.get_text(" ", strip=True) if summary is not None else ""
+        cards.append({"title": title, "url": base_url + article.find('a')['href'], "summary": summary})
+    return cards
+
+# Function to extract the raw text of the abstract section of an article page (None if there is none)
+def parse_abstract(html, backend=None):
+    backend = _resolve_backend(backend)
+    if backend == "selectolax":
+        section = LexborHTMLParser(html).css_first("div." + ABSTRACT_SECTION_CLASS)
+        if section is None:
+            return None
+        # Drop script and style text, which BeautifulSoup's get_text leaves out too
+        section.strip_tags(["script", "style"])
+        return section.text(deep=True, separator="", strip=True)
+
+    strainer = SoupStrainer('div', class_=ABSTRACT_SECTION_CLASS)
+    soup = BeautifulSoup(html, backend, parse_only=strainer)
+    section = soup.find('div', {'class': ABSTRACT_SECTION_CLASS})
+    if section is None:
+        return None
+    return section.get_text(strip=True)
+
+# Function to read the abstract and title from the <meta> tags in <head>, without parsing the body
+def parse_head_meta(html):
+    match = _HEAD_END.search(html)
+    parser = AbstractStreamParser()
+    parser.feed(html[:match.end()] if match else html)
+    return {"title": parser.meta_title, "abstract": parser.meta_abstract}
+
+# Function to get the abstract of a whole (or cached) article page: from the head meta tags
+# if possible, otherwise from the abstract section. Returns the text (None if the page has
+# no abstract) and where it was found, "head_meta" or "section".
+def extract_abstract(html, backend=None):
+    if USE_HEAD_META_ABSTRACT:
+        abstract_text = parse_head_meta(html)["abstract"]
+        if abstract_text is not None:
+            return abstract_text, "head_meta"
+    return parse_abstract(html, backend), "section"
+
+class AbstractStreamParser(HTMLParser):
+    """Incremental parser for an article page that is fed chunk by chunk while it
+    downloads. It records the abstract and title <meta> tags in <head>, collects
+    the text of the first abstract section the same way parse_abstract does, and
+    sets `done` as soon as enough has been read: the end of <head> when the meta
+    tags had an abstract (and prefer_head_meta is on), otherwise the end of the
+    abstract section. The rest of the page does not need to be downloaded."""
+
+    def __init__(self, prefer_head_meta=None):
+        super().__init__(convert_charrefs=True)
+        self.prefer_head_meta = USE_HEAD_META_ABSTRACT if prefer_head_meta is None else prefer_head_meta
+        self.head_done = False
+        self.section_done = False
+        self.meta = {}
+        self._abstract_parts = None
+        self._div_depth = 0
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        return self.section_done or (self.prefer_head_meta and self.head_done and self.meta_abstract is not None)
+
+    @property
+    def meta_abstract(self):
+        return next((self.meta[name] for name in ABSTRACT_META_NAMES if name in self.meta), None)
+
+    @property
+    def meta_title(self):
+        return next((self.meta[name] for name in TITLE_META_NAMES if name in self.meta), None)
+
+    def handle_starttag(self, tag, attrs):
+        if not self.head_done:
+            if tag == "meta":
+                attrs = dict(attrs)
+                name = (attrs.get("name") or attrs.get("property") or "").lower()
+                content = (attrs.get("content") or "").strip()
+                if content and (name in ABSTRACT_META_NAMES or name in TITLE_META_NAMES):
+                    self.meta.setdefault(name, content)
+                return
+            if tag == "body":
+                self.head_done = True
+
+        if self.section_done:
+            return
+        if self._div_depth:
+            if tag == "div":
+                self._div_depth += 1
+            elif tag in ("script", "style"):
+                self._skip_depth += 1
+        elif tag == "div" and ABSTRACT_SECTION_CLASS in (dict(attrs).get("class") or "").split():
+            self._div_depth = 1
+            self._abstract_parts = []
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.head_done = True
+        if self.section_done or not self._div_depth:
+            return
+        if tag == "div":
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                self.section_done = True
+        elif tag in ("script", "style") and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._div_depth and not self._skip_depth and not self.section_done:
+            text = data.strip()
+            if text:
+                self._abstract_parts.append(text)
+
+    @property
+    def abstract(self):
+        if self._abstract_parts is None:
+            return None
+        return "".join(self._abstract_parts)
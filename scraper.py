@@ -0,0 +1,1325 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import HTTPError as Urllib3Error
+import random
+import math
+import re
+import logging
+import threading
+import os
+import hashlib
+import zlib
+import json
+import codecs
+import time
+import multiprocessing
+import signal
+import socket
+import weakref
+import tempfile
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from parsers import parse_listing_cards, extract_abstract, available_backends, decode_html, find_charset, AbstractStreamParser
+
+NATURE_BASE_URL = "https://www.nature.com"
+FURTHEST_NATURE_DIRECTORY_PAGE = 1000    # used until the real last listing page has been discovered
+REQUEST_TIMEOUT = 10    # in seconds
+SCRAPE_WORKERS = 8      # max pages scraped at the same time
+HTTP_POOL_CONNECTIONS = 4           # number of hosts to keep connection pools for
+HTTP_POOL_MAXSIZE = SCRAPE_WORKERS + 2  # keep-alive connections kept per host (the scrape workers and page discovery)
+# Never wait for a free connection: SCRAPE_WORKERS already caps how many are in use, and at
+# exit urllib3 empties the pool before the preload scrape runs, so a blocking pool waits forever
+HTTP_POOL_BLOCK = False
+CANDIDATE_POOL_MAX = 500            # max harvested listing cards kept waiting to be scraped
+CARDS_PER_LISTING_PAGE = 20
+RANK_CANDIDATES_PER_ARTICLE = 5     # with a candidate scorer, listing cards scored for every article page fetched
+HTTP_CACHE_DIRECTORY = "http_cache"
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024   # least recently used pages are evicted past this
+HTTP_CACHE_RESCAN_INTERVAL = 60     # in seconds, how often the cache size is recounted to include pages written by other processes
+LISTING_CACHE_FILE = "listing_cache.json"  # ETag/Last-Modified and parsed cards of listing pages
+STREAM_ARTICLE_PAGES = True    # stop downloading an article page once its abstract has been read
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_DRAIN_MAX_BYTES = 64 * 1024    # finish reading short leftovers so the keep-alive connection can be reused
+MAX_RETRIES = 3                 # retries per request on connection errors, timeouts and RETRY_STATUS_CODES
+RETRY_BACKOFF_BASE = 0.5        # in seconds, doubled on every retry and jittered
+RETRY_BACKOFF_MAX = 8           # in seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+CIRCUIT_FAILURE_THRESHOLD = 5   # consecutive failures before requests to a host are refused
+CIRCUIT_RESET_TIMEOUT = 30      # in seconds, before one trial request is let through again
+HEDGE_EXTRA_FETCHES = 3         # extra articles scraped per batch to cover slow or failed fetches
+MAX_SCRAPE_ATTEMPTS_FACTOR = 3  # give up on a batch after this many attempts per wanted article
+SAMPLE_DEADLINE = 30            # in seconds, for a whole scrape_random_sample call
+PAGE_COUNT_FILE = "nature_page_count.json"    # discovered last listing page and pages known to be empty
+PAGE_COUNT_REFRESH_INTERVAL = 24 * 60 * 60    # in seconds
+PAGE_COUNT_RETRY_INTERVAL = 30 * 60           # in seconds after a failed discovery before it is tried again
+SAMPLER_STATE_FILE = "sampler_state.json"     # when each listing page was last fetched, and the cards not scraped yet
+PAGE_REVISIT_INTERVAL = 6 * 60 * 60           # in seconds before page 1 is fetched again, page n waits n times as long
+RATE_LIMIT_PER_SECOND = 5.0     # requests per second to nature.com across all threads
+RATE_LIMIT_BURST = 10           # requests that can be sent back to back after an idle period
+RATE_LIMIT_MIN_RATE = 0.5       # the rate never backs off below this
+RATE_LIMIT_INCREASE = 0.05      # added to the rate after every successful request
+RATE_LIMIT_DECREASE_FACTOR = 0.5    # the rate is multiplied by this on 429/503
+RETRY_AFTER_MAX = 120           # in seconds, longest Retry-After that is honored
+THROTTLE_STATUS_CODES = {429, 503}
+PARSE_WORKERS = 2               # processes that parse downloaded html, 0 to parse on the scraping threads
+WARM_UP_CONNECTIONS = 4         # keep-alive connections opened ahead of the first scrape, 0 to skip the warm-up
+CANCEL_CHECK_INTERVAL = 0.25    # in seconds, how often a scrape waiting on its workers checks for cancellation
+
+logger = logging.getLogger(__name__)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def _record_stat(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+# Function to get a snapshot of the scraper counters (connections, cache hits, timings, ...)
+def get_scraper_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    for name, hits, misses in [("http_cache_hit_rate", "http_cache_hits", "http_cache_misses"),
+                               ("listing_not_modified_rate", "listing_not_modified", "listing_downloads")]:
+        total = stats.get(hits, 0) + stats.get(misses, 0)
+        if total:
+            stats[name] = round(stats.get(hits, 0) / total, 3)
+    if _rate_limiter is not None:
+        stats["rate_limit_current_rate"] = round(_rate_limiter.rate, 2)
+    if stats.get("pages_decoded"):
+        stats["decode_ms_per_page"] = round(stats.get("decode_seconds", 0) * 1000 / stats["pages_decoded"], 3)
+    if stats.get("article_downloads"):
+        stats["article_bytes_per_download"] = stats.get("article_bytes_downloaded", 0) // stats["article_downloads"]
+    return stats
+
+# Connection pools that count whether each request got a live keep-alive
+# connection back from the pool or had to open a new one. A connection handed to
+# a request with a CancelToken is tracked by the token until it comes back.
+class _CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        # The warm-up's own checkouts are counted as connections_warmed instead
+        if getattr(_thread_local, "warming_up", False):
+            return conn
+        reused = getattr(conn, "sock", None) is not None
+        if reused:
+            _record_stat("connections_reused")
+        else:
+            _record_stat("connections_new")
+        if _warm_up_pending:
+            _record_warm_up_saving(reused)
+        token = getattr(_thread_local, "token", None)
+        if token is not None:
+            token._track(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        token = getattr(conn, "_cancel_token", None)
+        if token is not None:
+            token._untrack(conn)
+        super()._put_conn(conn)
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+_adapter = None
+_adapter_lock = threading.Lock()
+_thread_local = threading.local()
+
+def _get_adapter():
+    global _adapter
+    with _adapter_lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                   pool_maxsize=HTTP_POOL_MAXSIZE,
+                                   pool_block=HTTP_POOL_BLOCK)
+            _adapter.poolmanager.pool_classes_by_scheme = {
+                "http": _CountingHTTPConnectionPool,
+                "https": _CountingHTTPSConnectionPool,
+            }
+        return _adapter
+
+# Function to get this thread's session. Every thread gets its own Session (they are
+# not safe to share) but all of them are mounted on the same adapter, so they draw
+# from one keep-alive connection pool.
+def get_session():
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = _get_adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_local.session = session
+    return session
+
+# What the connection warm-up saved the first request made after it started
+_warm_up_lock = threading.Lock()
+_warm_up_pending = False            # a warm-up ran and the first request after it has not been counted
+_warm_up_connect_seconds = 0        # how long opening the first warmed connection took
+_warm_up_first_conn_ready = threading.Event()    # set once the first warmed connection is in the pool (or the warm-up failed)
+
+# Function to record what the warm-up saved the first request: the time opening a
+# connection took, if the request got a warmed one instead of opening its own
+def _record_warm_up_saving(reused):
+    global _warm_up_pending
+    with _warm_up_lock:
+        if not _warm_up_pending:
+            return
+        _warm_up_pending = False
+    _record_stat("warm_up_first_request_reused", int(reused))
+    _record_stat("warm_up_seconds_saved", _warm_up_connect_seconds if reused else 0)
+
+# Function to resolve nature.com and open WARM_UP_CONNECTIONS keep-alive connections to
+# it in the shared pool, so the first scrape does not pay for DNS and TLS handshakes.
+# Each connection goes back to the pool as soon as it is open, so a request starting
+# meanwhile can use it. Meant to run on a background thread while the app starts. What
+# it saved the first request is in the warm_up_seconds_saved stat. Returns the seconds it took.
+def warm_up_connections(num_connections=None):
+    global _warm_up_pending, _warm_up_connect_seconds
+    num_connections = WARM_UP_CONNECTIONS if num_connections is None else num_connections
+    if num_connections <= 0:
+        return 0
+    start = time.perf_counter()
+    with _warm_up_lock:
+        _warm_up_pending = True
+        _warm_up_first_conn_ready.clear()
+    conns = []
+    conns_lock = threading.Lock()
+
+    def put_back(conn):
+        with conns_lock:
+            conns.remove(conn)
+        pool._put_conn(conn)
+
+    # Function to open a checked out connection and put it back in the pool
+    def connect(conn):
+        try:
+            conn.connect()
+        finally:
+            put_back(conn)
+
+    try:
+        # Get the pool the scraper's own requests will use, which depends on the TLS
+        # settings. get_connection_with_tls_context needs requests 2.32.2 or later, on an
+        # older one the warm-up is skipped.
+        session = get_session()
+        request = session.prepare_request(requests.Request("GET", NATURE_BASE_URL))
+        settings = session.merge_environment_settings(request.url, {}, None, None, None)
+        pool = _get_adapter().get_connection_with_tls_context(request, settings["verify"], settings["proxies"], settings["cert"])
+        _thread_local.warming_up = True
+        try:
+            conns = [pool._get_conn() for _ in range(num_connections)]
+        finally:
+            _thread_local.warming_up = False
+        # The first connect resolves the host name, the others run in parallel with it cached
+        connect_start = time.perf_counter()
+        conns[0].connect()
+        _warm_up_connect_seconds = time.perf_counter() - connect_start
+        put_back(conns[0])
+        _warm_up_first_conn_ready.set()
+        with ThreadPoolExecutor(max_workers=num_connections) as executor:
+            list(executor.map(connect, list(conns)))
+        _record_stat("connections_warmed", num_connections)
+        logger.info("Warmed up %s connections to %s.", num_connections, NATURE_BASE_URL)
+    except (OSError, Urllib3Error, AttributeError) as e:
+        logger.info("Could not warm up connections to %s: %s", NATURE_BASE_URL, e)
+    finally:
+        # Put back the connections that were never opened
+        for conn in list(conns):
+            pool._put_conn(conn)
+        _warm_up_first_conn_ready.set()
+    return time.perf_counter() - start
+
+class ScrapeCancelled(requests.RequestException):
+    """Raised when a scrape is cancelled through its CancelToken or runs past the token's deadline."""
+
+class CancelToken:
+    """Cancellation token and optional deadline shared by every request of a scrape.
+    It is checked between requests and between the chunks of a download, waits for
+    the rate limiter and retry backoff wake up as soon as it is cancelled, and request
+    timeouts are cut to the time left before the deadline, so a socket read cannot
+    outlive it. Cancelling also shuts down the sockets the token's requests are
+    reading from, so they do not sit out their timeout. A child token (made with
+    parent=) is cancelled with its parent and never outlives the parent's deadline,
+    but can be cancelled on its own."""
+
+    def __init__(self, deadline=None, parent=None):
+        self.deadline_at = None if deadline is None else time.monotonic() + deadline
+        self._cancelled = threading.Event()
+        self._connections = set()
+        self._children = weakref.WeakSet()
+        self._lock = threading.Lock()
+        if parent is not None:
+            if parent.deadline_at is not None and (self.deadline_at is None or parent.deadline_at < self.deadline_at):
+                self.deadline_at = parent.deadline_at
+            with parent._lock:
+                parent._children.add(self)
+            if parent._cancelled.is_set():
+                self._cancelled.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            connections = list(self._connections)
+            children = list(self._children)
+        for conn in connections:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for child in children:
+            child.cancel()
+
+    def _track(self, conn):
+        with self._lock:
+            self._connections.add(conn)
+        conn._cancel_token = self
+
+    def _untrack(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        conn._cancel_token = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set() or (self.deadline_at is not None and time.monotonic() >= self.deadline_at)
+
+    # Function to get the seconds left before the deadline (None if there is none)
+    def remaining(self):
+        if self.deadline_at is None:
+            return None
+        return max(0, self.deadline_at - time.monotonic())
+
+    # Function to raise ScrapeCancelled if the scrape should stop
+    def check(self):
+        if self._cancelled.is_set():
+            raise ScrapeCancelled("Scrape cancelled")
+        if self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            raise ScrapeCancelled("Scrape deadline passed")
+
+    # Function to sleep for up to the given seconds, waking early (with ScrapeCancelled) when cancelled
+    def sleep(self, seconds):
+        remaining = self.remaining()
+        self._cancelled.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
+
+    # Function to cut a request timeout down to the time left before the deadline
+    def timeout(self, timeout):
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        self.check()
+        return min(timeout, remaining)
+
+class TokenBucket:
+    """Token bucket rate limiter shared by every scraping thread. The rate backs off
+    multiplicatively when the server throttles us (429/503), creeps back up
+    additively on success, and Retry-After pauses all requests until it passes."""
+
+    def __init__(self, rate, burst, min_rate=RATE_LIMIT_MIN_RATE):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._last_decrease = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Function to wait until a request may be sent. Returns the time spent waiting.
+    def acquire(self, token=None):
+        waited = 0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = (1 - self._tokens) / self.rate
+            if token is not None:
+                token.sleep(delay)
+            else:
+                time.sleep(delay)
+            waited += delay
+        if waited:
+            _record_stat("rate_limit_waits")
+            _record_stat("rate_limit_wait_seconds", waited)
+        return waited
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RATE_LIMIT_INCREASE)
+
+    def on_throttled(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            # Many requests in flight get throttled together, back off once for all of them
+            if now - self._last_decrease >= 1 / self.rate:
+                self._refill(now)
+                self.rate = max(self.min_rate, self.rate * RATE_LIMIT_DECREASE_FACTOR)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + min(retry_after, RETRY_AFTER_MAX))
+        _record_stat("throttled_responses")
+        logger.info("Throttled by the server, rate is now %.2f requests/s.", self.rate)
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+# Function to get the process-wide rate limiter
+def get_rate_limiter():
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        return _rate_limiter
+
+# Function to change the request rate budget of this process, e.g. to keep a
+# long-running crawler well below what an interactive session may use
+def set_rate_limit(rate_per_second):
+    rate_limiter = get_rate_limiter()
+    with rate_limiter._lock:
+        rate_limiter.max_rate = rate_per_second
+        rate_limiter.rate = min(rate_limiter.rate, rate_per_second)
+
+# Function to read a Retry-After header (seconds or an HTTP date) as seconds
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host that keeps failing."""
+
+# Per-host circuit breaker state: consecutive failures and when the circuit opened
+_circuits = {}
+_circuits_lock = threading.Lock()
+
+def _check_circuit(host):
+    with _circuits_lock:
+        circuit = _circuits.get(host)
+        if not circuit or circuit["opened_at"] is None:
+            return
+        if time.monotonic() - circuit["opened_at"] < CIRCUIT_RESET_TIMEOUT:
+            _record_stat("circuit_rejections")
+            raise CircuitOpenError(f"Too many failures talking to {host}, not sending requests for now")
+        # Half open: let this request through as a trial and hold the others back until it is done
+        circuit["opened_at"] = time.monotonic()
+
+def _record_host_result(host, ok):
+    with _circuits_lock:
+        circuit = _circuits.setdefault(host, {"failures": 0, "opened_at": None})
+        if ok:
+            circuit["failures"] = 0
+            circuit["opened_at"] = None
+            return
+        circuit["failures"] += 1
+        if circuit["failures"] >= CIRCUIT_FAILURE_THRESHOLD and circuit["opened_at"] is None:
+            circuit["opened_at"] = time.monotonic()
+            _record_stat("circuit_opened")
+            logger.warning("Opened circuit for %s after %s failures.", host, circuit["failures"])
+
+def _backoff_delay(attempt):
+    # Full jitter: a random delay up to the exponential backoff for this attempt
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+def _send(url, token, **kwargs):
+    # Lets the pool hand the connection this request gets to the token, see _CountingPoolMixin
+    _thread_local.token = token
+    try:
+        return get_session().get(url, **kwargs)
+    finally:
+        _thread_local.token = None
+
+# Function to GET a url through the shared connection pool. Connection errors, timeouts
+# and RETRY_STATUS_CODES are retried with jittered exponential backoff, and hosts that
+# keep failing are skipped by a circuit breaker. Every attempt waits its turn in the
+# shared rate limiter. With a token the whole call, retries included, stops with
+# ScrapeCancelled when the token is cancelled or its deadline passes.
+def fetch(url, token=None, **kwargs):
+    if token is None:
+        token = CancelToken()
+    timeout = kwargs.pop("timeout", REQUEST_TIMEOUT)
+    host = urlsplit(url).netloc
+    rate_limiter = get_rate_limiter()
+    for attempt in range(MAX_RETRIES + 1):
+        token.check()
+        _check_circuit(host)
+        rate_limiter.acquire(token)
+        # A warm-up that is opening a connection will have it ready sooner than a new one
+        if _warm_up_pending:
+            _warm_up_first_conn_ready.wait(token.timeout(timeout))
+        try:
+            response = _send(url, token, timeout=token.timeout(timeout), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            token.check()
+            _record_host_result(host, ok=False)
+            if attempt == MAX_RETRIES:
+                raise
+            logger.info("Retrying %s after error: %s", url, e)
+        else:
+            if response.status_code in THROTTLE_STATUS_CODES:
+                rate_limiter.on_throttled(_parse_retry_after(response.headers.get("Retry-After")))
+            else:
+                rate_limiter.on_success()
+            if response.status_code not in RETRY_STATUS_CODES:
+                _record_host_result(host, ok=True)
+                response.raise_for_status()  # Check if request was successful
+                return response
+            _record_host_result(host, ok=False)
+            if attempt == MAX_RETRIES:
+                response.raise_for_status()
+            response.close()
+            logger.info("Retrying %s after HTTP %s", url, response.status_code)
+        _record_stat("fetch_retries")
+        token.sleep(_backoff_delay(attempt))
+
+# Function to normalize a url so that equivalent urls share a cache entry
+def normalize_url(url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+# Function to write a file under a temporary name and rename it into place, so readers
+# never see half of it. The temporary name is unique, so processes sharing the file
+# (the GUI and crawler.py) never write to the same one.
+def _write_file_atomically(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+_cache_lock = threading.Lock()
+_cache_bytes = None     # total size of the cached pages, recounted every HTTP_CACHE_RESCAN_INTERVAL
+_cache_scanned_at = 0
+
+def _cache_path(url):
+    key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIRECTORY, key + ".z")
+
+# Function to read a cached page body (None on a miss). Reading a page marks it as recently used.
+def cache_get(url):
+    path = _cache_path(url)
+    try:
+        with open(path, "rb") as file:
+            content = zlib.decompress(file.read())
+        os.utime(path)
+    except (OSError, zlib.error):
+        _record_stat("http_cache_misses")
+        return None
+    _record_stat("http_cache_hits")
+    return content
+
+# Function to store a page body in the on-disk cache, evicting least recently used pages past HTTP_CACHE_MAX_BYTES
+def cache_put(url, content):
+    global _cache_bytes
+    path = _cache_path(url)
+    data = zlib.compress(content)
+    try:
+        with _cache_lock:
+            if not os.path.exists(HTTP_CACHE_DIRECTORY):
+                os.makedirs(HTTP_CACHE_DIRECTORY)
+            if _cache_bytes is None or time.monotonic() - _cache_scanned_at > HTTP_CACHE_RESCAN_INTERVAL:
+                _scan_cache_entries()
+            if os.path.exists(path):
+                _cache_bytes -= os.path.getsize(path)
+
+            _write_file_atomically(path, data)
+            _cache_bytes += len(data)
+
+            if _cache_bytes > HTTP_CACHE_MAX_BYTES:
+                _evict_cache_entries()
+    except OSError as e:
+        logger.warning("Error writing %s to the http cache: %s", url, e)
+
+# Function to recount the cached pages, including the ones other processes wrote or
+# evicted since the last count. Returns (mtime, size, path) for each, oldest first. (hold _cache_lock)
+def _scan_cache_entries():
+    global _cache_bytes, _cache_scanned_at
+    entries = []
+    for entry in os.scandir(HTTP_CACHE_DIRECTORY):
+        if not entry.name.endswith(".z"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    _cache_bytes = sum(size for _, size, _ in entries)
+    _cache_scanned_at = time.monotonic()
+    return sorted(entries)
+
+def _evict_cache_entries():
+    global _cache_bytes
+    for _, size, path in _scan_cache_entries():
+        if _cache_bytes <= HTTP_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Evicted by the other process meanwhile
+            pass
+        _cache_bytes -= size
+        _record_stat("http_cache_evictions")
+
+# Function to download an article page only as far as needed for the abstract: the end
+# of <head> if its meta tags have the abstract, otherwise the end of the abstract section.
+# Returns the html received so far and the abstract text (None if the page has none).
+def stream_article_page(article_url, token=None):
+    if token is None:
+        token = CancelToken()
+    parser = AbstractStreamParser()
+    html_parts = []
+    num_bytes = 0
+    decode_seconds = 0
+    with fetch(article_url, token=token, stream=True) as response:
+        decoder = None
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            token.check()
+            num_bytes += len(chunk)
+            start = time.perf_counter()
+            if decoder is None:
+                charset = find_charset(response.headers.get("Content-Type"), chunk) or "utf-8"
+                decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+            text = decoder.decode(chunk)
+            decode_seconds += time.perf_counter() - start
+            html_parts.append(text)
+            parser.feed(text)
+            if parser.done:
+                _record_stat("article_downloads_stopped_early")
+                break
+
+        # Closing a half-read response drops the connection, which only pays off
+        # when more than a little of the page is left
+        content_length = int(response.headers.get("Content-Length") or 0)
+        if parser.done and 0 < content_length - response.raw.tell() <= STREAM_DRAIN_MAX_BYTES:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                token.check()
+                num_bytes += len(chunk)
+
+    _record_stat("article_downloads")
+    _record_stat("article_bytes_downloaded", num_bytes)
+    _record_stat("pages_decoded")
+    _record_stat("decode_seconds", decode_seconds)
+    logger.debug("Read %s bytes of %s", num_bytes, article_url)
+
+    if parser.prefer_head_meta and parser.meta_abstract is not None:
+        _record_stat("abstracts_from_head_meta")
+        return "".join(html_parts), parser.meta_abstract
+    return "".join(html_parts), parser.abstract
+
+# Function to decode a response body with its declared charset (or UTF-8), timing the decode
+def decode_response(response):
+    start = time.perf_counter()
+    html = decode_html(response.content, response.headers.get("Content-Type"))
+    _record_stat("pages_decoded")
+    _record_stat("decode_seconds", time.perf_counter() - start)
+    return html
+
+_parse_executor = None
+_parse_executor_broken = False
+_parse_executor_lock = threading.Lock()
+
+# Ctrl+C reaches the whole process group. The workers leave it to the parent, which shuts them down.
+def _ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _get_parse_executor():
+    global _parse_executor
+    with _parse_executor_lock:
+        # Workers are forked so they do not re-run the GUI script the way spawned ones would
+        if PARSE_WORKERS <= 0 or _parse_executor_broken or "fork" not in multiprocessing.get_all_start_methods():
+            return None
+        if _parse_executor is None:
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("fork"),
+                                                 initializer=_ignore_interrupts)
+        return _parse_executor
+
+# Function to start the parse worker processes. Call it early, before the GUI and any
+# other threads exist, so the workers are forked from a quiet process.
+def start_parse_workers():
+    executor = _get_parse_executor()
+    if executor is not None:
+        executor.submit(available_backends).result()
+
+# Function to run a parse function in the parse worker processes, so the CPU-heavy html
+# parsing does not hold the GIL that the Tk main loop needs. Only the html goes in and
+# small dicts come back. Falls back to parsing on this thread when there are no workers.
+def _parse(function, *args):
+    global _parse_executor_broken
+    executor = _get_parse_executor()
+    if executor is not None:
+        try:
+            result = executor.submit(function, *args).result()
+            _record_stat("parses_in_worker_process")
+            return result
+        except BrokenProcessPool as e:
+            with _parse_executor_lock:
+                _parse_executor_broken = True
+            logger.warning("Parse worker processes failed, parsing on scraping threads: %s", e)
+        except RuntimeError:
+            # concurrent.futures refuses new work once the interpreter is shutting
+            # down, which is when the exit-time preload scrape runs
+            pass
+    _record_stat("parses_on_thread")
+    return function(*args)
+
+# Function to get the abstract from a whole (or cached) article page
+def _extract_abstract(html):
+    abstract_text, source = _parse(extract_abstract, html)
+    if source == "head_meta":
+        _record_stat("abstracts_from_head_meta")
+    return abstract_text
+
+# Function to get the raw abstract text of an article page, from the on-disk cache if possible
+def fetch_article_abstract(article_url, token=None):
+    content = cache_get(article_url)
+    if content is not None:
+        return _extract_abstract(content.decode("utf-8"))
+
+    if STREAM_ARTICLE_PAGES:
+        html, abstract_text = stream_article_page(article_url, token)
+    else:
+        response = fetch(article_url, token=token)
+        _record_stat("article_downloads")
+        _record_stat("article_bytes_downloaded", len(response.content))
+        html = decode_response(response)
+        abstract_text = _extract_abstract(html)
+    cache_put(article_url, html.encode("utf-8"))
+    return abstract_text
+
+# Function to get a canonical key for an article url: its DOI for nature.com article
+# pages (/articles/<suffix> is DOI 10.1038/<suffix>), otherwise the normalized url
+def article_key(url):
+    path = urlsplit(url).path.rstrip("/")
+    if path.startswith("/articles/"):
+        return "doi:10.1038/" + path[len("/articles/"):].lower()
+    return normalize_url(url)
+
+# Check for articles the caller has already seen, set through set_seen_check
+_is_seen = None
+
+# Function to register a callable that takes an article_key and returns whether that
+# article was already seen. Seen cards are skipped before their article page is fetched.
+def set_seen_check(is_seen):
+    global _is_seen
+    _is_seen = is_seen
+
+def _card_seen(card):
+    return _is_seen is not None and _is_seen(article_key(card["url"]))
+
+# Scores listing cards for relevance, set through set_candidate_scorer
+_score_cards = None
+_can_score = None
+
+# Function to register a callable that takes a list of listing cards ({"title", "url",
+# "summary"}) and returns a relevance score for each, or None if it cannot score them.
+# Batches then fetch article pages only for the best scoring cards in the candidate pool.
+# can_score, if given, is called before every batch and returns whether score_cards
+# would score anything, so batches skip harvesting listing pages when it would not.
+def set_candidate_scorer(score_cards, can_score=None):
+    global _score_cards, _can_score
+    _score_cards = score_cards
+    _can_score = can_score
+
+# Cards harvested from listing pages that have not been scraped yet
+_candidate_pool = []
+_candidate_urls = set()
+_harvested_pages = set()
+_candidate_lock = threading.Lock()
+
+# Function to add listing cards to the candidate pool, dropping the oldest ones past CANDIDATE_POOL_MAX
+def _add_candidates(cards):
+    with _candidate_lock:
+        for card in cards:
+            if card["url"] not in _candidate_urls:
+                _candidate_urls.add(card["url"])
+                _candidate_pool.append(card)
+        while len(_candidate_pool) > CANDIDATE_POOL_MAX:
+            _candidate_urls.discard(_candidate_pool.pop(0)["url"])
+
+# Function to take an unseen card out of the candidate pool (None if there is none): the
+# best scoring one if the cards have been scored, otherwise a random one
+def _take_candidate():
+    while True:
+        with _candidate_lock:
+            if not _candidate_pool:
+                return None
+            index = max(range(len(_candidate_pool)), key=lambda i: _candidate_pool[i].get("relevance", -math.inf))
+            if _candidate_pool[index].get("relevance") is None:
+                index = random.randrange(len(_candidate_pool))
+            card = _candidate_pool.pop(index)
+            _candidate_urls.discard(card["url"])
+        if not _card_seen(card):
+            return card
+
+# Function to get the number of cards waiting in the candidate pool
+def candidate_pool_size():
+    with _candidate_lock:
+        return len(_candidate_pool)
+
+# Function to score the pooled cards that have no score yet with the candidate scorer
+def _score_candidates():
+    with _candidate_lock:
+        cards = [card for card in _candidate_pool if "relevance" not in card]
+    if not cards:
+        return
+    scores = _score_cards(cards)
+    if scores is None:
+        return
+    for card, score in zip(cards, scores):
+        card["relevance"] = float(score)
+    _record_stat("candidates_scored", len(cards))
+
+_listing_cache = None
+_listing_cache_dirty = False
+_listing_cache_lock = threading.Lock()
+
+# Function to get the listing cache, loading it from LISTING_CACHE_FILE the first time (hold _listing_cache_lock)
+def _get_listing_cache():
+    global _listing_cache
+    if _listing_cache is None:
+        _listing_cache = {}
+        if os.path.exists(LISTING_CACHE_FILE):
+            try:
+                with open(LISTING_CACHE_FILE, "r") as file:
+                    _listing_cache = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning("Error loading listing cache: %s", e)
+    return _listing_cache
+
+# Function to write the listing cache back to disk if it changed
+def save_listing_cache():
+    global _listing_cache_dirty
+    with _listing_cache_lock:
+        if not _listing_cache_dirty:
+            return
+        try:
+            _write_file_atomically(LISTING_CACHE_FILE, json.dumps(_listing_cache).encode("utf-8"))
+            _listing_cache_dirty = False
+        except OSError as e:
+            logger.warning("Error saving listing cache: %s", e)
+
+# Function to fetch a listing page and return every card on it as {"title", "url"}.
+# The request is conditional on the validators from the last download, and a
+# 304 Not Modified reuses the cards parsed back then.
+def scrape_listing_page(page_number, token=None):
+    global _listing_cache_dirty
+    url = f"{NATURE_BASE_URL}/nature/research-articles?searchType=journalSearch&sort=PubDate&page={page_number}"
+    cache_key = normalize_url(url)
+    with _listing_cache_lock:
+        cached = _get_listing_cache().get(cache_key)
+
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        response = fetch(url, token=token, headers=headers)
+    except requests.HTTPError as e:
+        # Pages past the end of the archive are a 404, which means no cards
+        if e.response is not None and e.response.status_code == 404:
+            _record_stat("listing_pages_not_found")
+            return []
+        raise
+    with _candidate_lock:
+        _harvested_pages.add(page_number)
+    _record_page_visit(page_number)
+
+    if response.status_code == 304 and cached:
+        _record_stat("listing_not_modified")
+        return [dict(card) for card in cached["cards"]]
+
+    # Find all articles on the page
+    cards = _parse(parse_listing_cards, decode_response(response), NATURE_BASE_URL)
+    _record_stat("listing_downloads")
+    _record_stat("listing_cards_harvested", len(cards))
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _listing_cache_lock:
+            _get_listing_cache()[cache_key] = {"etag": etag, "last_modified": last_modified, "cards": cards}
+            _listing_cache_dirty = True
+    return [dict(card) for card in cards]
+
+# Function to scrape the abstract for a listing card
+def scrape_article(card, token=None):
+    title = card["title"]
+    article_url = card["url"]
+    # The card may have been seen while it was waiting to be scraped
+    if _card_seen(card):
+        _record_stat("article_fetches_skipped_seen")
+        return None
+    logger.info("Scraping article: %s", title)
+
+    # Get the article page and attempt to extract the abstract
+    abstract_text = fetch_article_abstract(article_url, token)
+    if abstract_text is not None:
+        # Remove reference numbers (e.g., [1], [10])
+        #abstract_text = re.sub(r'\[\d+\]', '', abstract_text)
+        abstract_text = re.sub(r'(\w)(\d+(,\d+)*)', r'\1', abstract_text)
+        logger.info("Abstract cleaned for: %s", title)
+    else:
+        abstract_text = "Abstract not available."
+
+    # Return the scraped article data
+    return {"title": title, "abstract": abstract_text, "url": article_url, "score": 0, "liked": False}
+
+# Function to scrape a single random article from a given page. The other cards
+# on the page go into the candidate pool instead of being thrown away.
+def scrape_random_article_from_page(page_number, token=None):
+    try:
+        logger.info("Scraping a random article from page %s...", page_number)
+        cards = scrape_listing_page(page_number, token)
+        if not cards:
+            logger.info("No articles found on page %s.", page_number)
+            _record_empty_page(page_number)
+            return None
+
+        # Randomly select one unseen article from the page and keep the rest for later.
+        # A seen card picked here is a fetch the seen check saved.
+        card = random.choice(cards)
+        cards = [other for other in cards if not _card_seen(other)]
+        if card not in cards:
+            _record_stat("article_fetches_skipped_seen")
+            if not cards:
+                logger.info("All articles on page %s were already seen.", page_number)
+                return None
+            card = random.choice(cards)
+        cards.remove(card)
+        _add_candidates(cards)
+        return scrape_article(card, token)
+
+    except (requests.RequestException, Exception) as e:
+        # Let cancellation through instead of reporting it as a failed scrape
+        if token is not None:
+            token.check()
+        logger.warning("Error scraping article from page %s: %s", page_number, e)
+        return None
+
+# Discovered listing page count, loaded lazily from PAGE_COUNT_FILE
+_page_count = None
+_page_count_lock = threading.Lock()
+_discovery_thread = None
+
+def _get_page_count_state():
+    global _page_count
+    if _page_count is None:
+        _page_count = {"last_page": None, "checked_at": 0, "attempted_at": 0, "empty_pages": []}
+        if os.path.exists(PAGE_COUNT_FILE):
+            try:
+                with open(PAGE_COUNT_FILE, "r") as file:
+                    _page_count.update(json.load(file))
+            except (OSError, ValueError) as e:
+                logger.warning("Error loading listing page count: %s", e)
+    return _page_count
+
+def _save_page_count_state():
+    try:
+        _write_file_atomically(PAGE_COUNT_FILE, json.dumps(_page_count).encode("utf-8"))
+    except OSError as e:
+        logger.warning("Error saving listing page count: %s", e)
+
+# Function to remember a listing page that had no cards so it is not sampled again,
+# until a page count refresh finds the archive has grown past it
+def _record_empty_page(page_number):
+    with _page_count_lock:
+        state = _get_page_count_state()
+        if page_number not in state["empty_pages"]:
+            state["empty_pages"].append(page_number)
+            _save_page_count_state()
+    _record_stat("empty_listing_pages")
+
+# Function to check whether a listing page has any cards. The cards of probed pages
+# go into the candidate pool, so probing is not wasted.
+def _probe_listing_page(page_number):
+    cards = scrape_listing_page(page_number)
+    _record_stat("listing_page_probes")
+    _add_candidates(cards)
+    return bool(cards)
+
+# Function to find the last listing page with cards: gallop away from a starting guess
+# until a page with and a page without cards are known, then binary search between them
+def discover_last_page(start_page=1):
+    start_page = max(1, start_page)
+    if _probe_listing_page(start_page):
+        low, step = start_page, 1
+        while _probe_listing_page(low + step):
+            low += step
+            step *= 2
+        high = low + step
+    else:
+        high = start_page
+        low = start_page // 2
+        while low >= 1 and not _probe_listing_page(low):
+            high = low
+            low //= 2
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if _probe_listing_page(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+def _refresh_last_page(start_page):
+    global _discovery_thread
+    try:
+        last_page = discover_last_page(start_page)
+        with _page_count_lock:
+            state = _get_page_count_state()
+            if last_page:
+                # Pages recorded as empty below a larger last page were past the end
+                # back then, and have filled up since
+                if state["last_page"] is None or last_page > state["last_page"]:
+                    state["empty_pages"] = [page for page in state["empty_pages"] if page > last_page]
+                state["last_page"] = last_page
+                state["checked_at"] = time.time()
+                _save_page_count_state()
+        logger.info("Discovered %s listing pages.", last_page)
+    except (requests.RequestException, Exception) as e:
+        logger.warning("Error discovering the number of listing pages: %s", e)
+        # Keep the time of the attempt, so discovery is not retried before PAGE_COUNT_RETRY_INTERVAL
+        with _page_count_lock:
+            _save_page_count_state()
+    finally:
+        with _page_count_lock:
+            _discovery_thread = None
+
+# Function to get the listing pages worth sampling: up to the discovered last page, minus
+# pages known to be empty. A missing or stale page count is (re)discovered in the
+# background, and FURTHEST_NATURE_DIRECTORY_PAGE or the stale count is used meanwhile.
+# A discovery that failed is retried after PAGE_COUNT_RETRY_INTERVAL.
+def get_valid_pages():
+    global _discovery_thread
+    with _page_count_lock:
+        state = _get_page_count_state()
+        last_page = state["last_page"]
+        now = time.time()
+        stale = last_page is None or now - state["checked_at"] > PAGE_COUNT_REFRESH_INTERVAL
+        if stale and _discovery_thread is None and now - state["attempted_at"] > PAGE_COUNT_RETRY_INTERVAL:
+            state["attempted_at"] = now
+            _discovery_thread = threading.Thread(target=_refresh_last_page, args=(last_page or 1,), daemon=True)
+            try:
+                _discovery_thread.start()
+            except RuntimeError:
+                # No new threads while the interpreter shuts down (Python 3.12+), which is
+                # when the exit-time preload scrape runs. The current count is used instead.
+                _discovery_thread = None
+        empty_pages = set(state["empty_pages"])
+    last_page = last_page or FURTHEST_NATURE_DIRECTORY_PAGE
+    return [page for page in range(1, last_page + 1) if page not in empty_pages]
+
+# Listing page visits and leftover candidate cards, kept across sessions in SAMPLER_STATE_FILE
+_sampler_state = None
+_sampler_lock = threading.Lock()
+
+# Function to get the sampler state, loading it the first time (hold _sampler_lock). The
+# cards left over from earlier sessions go back into the candidate pool.
+def _get_sampler_state():
+    global _sampler_state
+    if _sampler_state is None:
+        _sampler_state = {"pages": {}, "candidates": []}
+        _sampler_state.update(_load_sampler_file())
+        _add_candidates(_sampler_state.pop("candidates"))
+    return _sampler_state
+
+def _load_sampler_file():
+    if os.path.exists(SAMPLER_STATE_FILE):
+        try:
+            with open(SAMPLER_STATE_FILE, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Error loading sampler state: %s", e)
+    return {}
+
+# Function to remember when a listing page was fetched
+def _record_page_visit(page_number):
+    with _sampler_lock:
+        _get_sampler_state()["pages"][str(page_number)] = time.time()
+
+# Function to write the sampler state, with the cards now in the candidate pool, back to
+# disk. Page visits saved meanwhile by the other process sharing the file are kept.
+def save_sampler_state():
+    with _candidate_lock:
+        candidates = [{key: card[key] for key in ("title", "url", "summary") if key in card} for card in _candidate_pool]
+    with _sampler_lock:
+        visits = _get_sampler_state()["pages"]
+        for page, visited_at in _load_sampler_file().get("pages", {}).items():
+            if visited_at > visits.get(page, 0):
+                visits[page] = visited_at
+        state = dict(_get_sampler_state(), candidates=candidates)
+        try:
+            _write_file_atomically(SAMPLER_STATE_FILE, json.dumps(state).encode("utf-8"))
+        except OSError as e:
+            logger.warning("Error saving sampler state: %s", e)
+
+# Function to choose up to num_pages of the given listing pages to fetch. Pages never
+# fetched come first, in random order. Then come pages due for a revisit, most overdue
+# first: shallow pages get new articles often and are due after PAGE_REVISIT_INTERVAL,
+# deep ones only after proportionally longer. Pages that are not due are not fetched.
+def _choose_pages(pages, num_pages):
+    now = time.time()
+    with _sampler_lock:
+        visits = _get_sampler_state()["pages"]
+        unvisited = [page for page in pages if str(page) not in visits]
+        overdue = []
+        for page in pages:
+            if str(page) in visits:
+                overdue_ratio = (now - visits[str(page)]) / (PAGE_REVISIT_INTERVAL * page)
+                if overdue_ratio >= 1:
+                    overdue.append((overdue_ratio, page))
+
+    chosen = random.sample(unvisited, min(num_pages, len(unvisited)))
+    overdue.sort(reverse=True)
+    revisits = [page for _, page in overdue[:num_pages - len(chosen)]]
+    _record_stat("listing_pages_revisited", len(revisits))
+    return chosen + revisits
+
+# Function to scrape a card that was already harvested into the candidate pool
+def scrape_pooled_candidate(card, token=None):
+    try:
+        _record_stat("candidates_from_pool")
+        return scrape_article(card, token)
+    except (requests.RequestException, Exception) as e:
+        if token is not None:
+            token.check()
+        logger.warning("Error scraping pooled article %s: %s", card["url"], e)
+        return None
+
+# Articles that finished after their batch was already full, handed out by the next batch
+_surplus_articles = []
+_surplus_lock = threading.Lock()
+
+def _take_surplus(max_articles):
+    with _surplus_lock:
+        articles = [article for article in _surplus_articles if not _card_seen(article)]
+        _surplus_articles[:] = articles[max_articles:]
+    return articles[:max_articles]
+
+# Function to fetch a listing page and add its unseen cards to the candidate pool
+def _harvest_listing_page(page_number, token):
+    try:
+        cards = scrape_listing_page(page_number, token)
+    except (requests.RequestException, Exception) as e:
+        token.check()
+        logger.warning("Error harvesting listing page %s: %s", page_number, e)
+        return
+    if not cards:
+        _record_empty_page(page_number)
+    _add_candidates([card for card in cards if not _card_seen(card)])
+
+# Function for the first stage of a ranked batch: fetch random listing pages that have
+# not been harvested yet, in parallel, until the candidate pool holds num_cards cards
+def _harvest_candidates(num_cards, token):
+    missing = num_cards - candidate_pool_size()
+    if missing <= 0:
+        return
+    valid_pages = get_valid_pages()
+    with _candidate_lock:
+        unharvested_pages = [page for page in valid_pages if page not in _harvested_pages]
+    pages = _choose_pages(unharvested_pages, math.ceil(missing / CARDS_PER_LISTING_PAGE))
+    logger.info("Harvesting %s listing pages to rank candidates...", len(pages))
+    try:
+        with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+            list(executor.map(lambda page_number: _harvest_listing_page(page_number, token), pages))
+    except RuntimeError:
+        # No new threads while the interpreter shuts down, see iter_random_sample
+        for page_number in pages:
+            token.check()
+            _harvest_listing_page(page_number, token)
+
+# Function to plan up to num_jobs scrape jobs: cards from the candidate pool first,
+# then listing pages that have not been harvested or planned yet, chosen by _choose_pages
+def _plan_scrape_jobs(num_jobs, planned_pages):
+    jobs = []
+    while len(jobs) < num_jobs:
+        card = _take_candidate()
+        if card is None:
+            break
+        jobs.append((scrape_pooled_candidate, card))
+
+    valid_pages = get_valid_pages()
+    with _candidate_lock:
+        unharvested_pages = [page for page in valid_pages if page not in _harvested_pages and page not in planned_pages]
+    for page_number in _choose_pages(unharvested_pages, num_jobs - len(jobs)):
+        planned_pages.add(page_number)
+        jobs.append((scrape_random_article_from_page, page_number))
+    return jobs
+
+# Callback for scrape jobs still running when their batch returned: finished articles
+# are kept for the next batch and pooled cards that never ran (or were cancelled) go back to the pool
+def _keep_abandoned_result(future, job):
+    if future.cancelled() or future.exception() is not None:
+        if job[0] is scrape_pooled_candidate:
+            _add_candidates([job[1]])
+        return
+    article = future.result()
+    if article:
+        with _surplus_lock:
+            _surplus_articles.append(article)
+
+# Function to run scrape jobs one after another on this thread, for when no worker
+# threads can be started
+def _iter_sequentially(jobs, num_wanted, deadline_at, planned_pages, token):
+    num_scraped = 0
+    num_attempts = 0
+    max_attempts = num_wanted * MAX_SCRAPE_ATTEMPTS_FACTOR
+    try:
+        while jobs and num_scraped < num_wanted and time.monotonic() < deadline_at and not token.cancelled:
+            function, argument = jobs.pop(0)
+            num_attempts += 1
+            try:
+                article = function(argument, token)
+            except ScrapeCancelled:
+                jobs.insert(0, (function, argument))
+                break
+            if article:
+                num_scraped += 1
+                yield article
+            elif not jobs and num_attempts < max_attempts:
+                jobs = _plan_scrape_jobs(1, planned_pages)
+    finally:
+        _add_candidates([argument for function, argument in jobs if function is scrape_pooled_candidate])
+        save_listing_cache()
+        save_sampler_state()
+
+# Function to scrape a random sample of articles from the valid listing pages, yielding
+# each article as soon as it has been scraped. Cards already in the candidate pool are
+# used first, and only the remainder costs a listing page fetch. Everything is scraped by
+# a bounded pool of worker threads. HEDGE_EXTRA_FETCHES more jobs than needed are
+# started, failed jobs are replaced, and once the batch is full (or the deadline passes,
+# or the caller stops iterating) the surplus is cancelled through the batch's own child
+# of the caller's token, so a batch takes about as long as its slowest useful fetch.
+# With a candidate scorer set (see set_candidate_scorer) that can score, the batch runs
+# in two stages, both within the deadline: listing pages are harvested until the pool holds
+# RANK_CANDIDATES_PER_ARTICLE cards per wanted article, and article pages are then
+# fetched only for the best scoring cards. Every request is made with the given CancelToken:
+# cancelling it (or passing its deadline) ends the batch with what has been scraped
+# so far and stops the jobs still running, hedged ones included.
+def iter_random_sample(sample_size=10, max_workers=None, deadline=None, token=None):
+    if token is None:
+        token = CancelToken()
+    logger.info("Starting random sample scrape of size %s...", sample_size)
+    num_scraped = 0
+    for article in _take_surplus(sample_size):
+        num_scraped += 1
+        yield article
+    if num_scraped >= sample_size:
+        return
+
+    # The first batch loads the sampler state, which refills the candidate pool from the last session
+    with _sampler_lock:
+        _get_sampler_state()
+
+    # The jobs run with the batch's own token, so the ones still running when the batch is
+    # over can be stopped without cancelling the caller's token
+    batch_token = CancelToken(SAMPLE_DEADLINE if deadline is None else deadline, parent=token)
+    deadline_at = batch_token.deadline_at
+    if _score_cards is not None and (_can_score is None or _can_score()):
+        try:
+            _harvest_candidates((sample_size - num_scraped) * RANK_CANDIDATES_PER_ARTICLE, batch_token)
+        except ScrapeCancelled:
+            return
+        _score_candidates()
+    max_attempts = sample_size * MAX_SCRAPE_ATTEMPTS_FACTOR
+    planned_pages = set()
+    jobs = _plan_scrape_jobs(sample_size - num_scraped + HEDGE_EXTRA_FETCHES, planned_pages)
+    if not jobs:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or SCRAPE_WORKERS)
+    try:
+        pending = {executor.submit(function, argument, batch_token): (function, argument) for function, argument in jobs}
+    except RuntimeError:
+        # concurrent.futures refuses new work once the interpreter is shutting down,
+        # which is when the exit-time preload scrape runs
+        yield from _iter_sequentially(jobs, sample_size - num_scraped, deadline_at, planned_pages, batch_token)
+        return
+    num_attempts = len(jobs)
+    num_from_pool = sum(1 for function, _ in jobs if function is scrape_pooled_candidate)
+    try:
+        while pending and num_scraped < sample_size:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Scrape deadline reached with %s of %s articles.", num_scraped, sample_size)
+                _record_stat("sample_deadlines_missed")
+                break
+            if token.cancelled:
+                logger.info("Scrape cancelled with %s of %s articles.", num_scraped, sample_size)
+                _record_stat("samples_cancelled")
+                break
+
+            # Wake up now and then to notice cancellation while the jobs are blocked in reads
+            done, _ = wait(pending, timeout=min(remaining, CANCEL_CHECK_INTERVAL), return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                article = future.result() if future.exception() is None else None
+                if article and num_scraped < sample_size:
+                    num_scraped += 1
+                    yield article
+                else:
+                    _keep_abandoned_result(future, job)
+
+            # Replace failed jobs so the batch still fills up, unless it is already over
+            missing = sample_size - num_scraped - len(pending)
+            if missing > 0 and num_attempts < max_attempts and not batch_token.cancelled:
+                replacements = _plan_scrape_jobs(min(missing, max_attempts - num_attempts), planned_pages)
+                for function, argument in replacements:
+                    pending[executor.submit(function, argument, batch_token)] = (function, argument)
+                num_attempts += len(replacements)
+                num_from_pool += sum(1 for function, _ in replacements if function is scrape_pooled_candidate)
+                _record_stat("scrape_jobs_replaced", len(replacements))
+    finally:
+        for future, job in pending.items():
+            future.add_done_callback(lambda future, job=job: _keep_abandoned_result(future, job))
+        _record_stat("scrape_jobs_hedged", len(pending))
+        # Stop the jobs that are still fetching, not just the ones still queued
+        batch_token.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+        save_listing_cache()
+        save_sampler_state()
+    logger.info("Scraped %s articles (%s jobs from the candidate pool).", num_scraped, num_from_pool)
+
+# Function to scrape a random sample of articles (see iter_random_sample) as a list
+def scrape_random_sample(sample_size=10, max_workers=None, deadline=None, token=None):
+    scraped_articles = list(iter_random_sample(sample_size, max_workers, deadline, token))
+    logger.info("Scraped %s articles.", len(scraped_articles))
+    return scraped_articles
@@ -0,0 +1,87 @@
+import os
+import math
+import mmap
+import struct
+import hashlib
+import threading
+import logging
+
+# Persistent record of the articles the user has already been shown, kept across sessions
+SEEN_FILTER_FILE = "seen_articles.bloom"
+SEEN_FILTER_CAPACITY = 300000           # articles before the false positive rate starts to climb
+SEEN_FILTER_FALSE_POSITIVE_RATE = 0.01  # ~360 KB on disk and in memory with the capacity above
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Bloom filter of article keys in a memory-mapped file. Its size is fixed when the
+    file is created (from the capacity and false positive rate), so memory use does
+    not grow with the number of articles added. Adds are written straight into the
+    mapping and reach the file without rewriting it."""
+
+    _MAGIC = b"IMRADBF1"
+    _HEADER = struct.Struct("<8sQIQ")    # magic, number of bits, number of hashes, number of keys added
+
+    def __init__(self, path, capacity=SEEN_FILTER_CAPACITY, false_positive_rate=SEEN_FILTER_FALSE_POSITIVE_RATE):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) < self._HEADER.size:
+            num_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+            with open(path, "wb") as file:
+                file.write(self._HEADER.pack(self._MAGIC, num_bits, num_hashes, 0))
+                file.truncate(self._HEADER.size + (num_bits + 7) // 8)
+
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.num_bits, self.num_hashes, self.count = self._HEADER.unpack_from(self._map, 0)
+        if magic != self._MAGIC or len(self._map) < self._HEADER.size + (self.num_bits + 7) // 8:
+            self.close()
+            raise ValueError(f"{path} is not a seen-article filter")
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = struct.unpack("<QQ", digest)
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        with self._lock:
+            added = False
+            for position in self._positions(key):
+                index = self._HEADER.size + position // 8
+                mask = 1 << (position % 8)
+                if not self._map[index] & mask:
+                    self._map[index] |= mask
+                    added = True
+            if added:
+                self.count += 1
+                self._HEADER.pack_into(self._map, 0, self._MAGIC, self.num_bits, self.num_hashes, self.count)
+
+    def __contains__(self, key):
+        return all(self._map[self._HEADER.size + position // 8] & (1 << (position % 8))
+                   for position in self._positions(key))
+
+    def flush(self):
+        with self._lock:
+            self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+_seen_filter = None
+_seen_filter_lock = threading.Lock()
+
+# Function to get the seen-article filter, opening (or creating) SEEN_FILTER_FILE on first use
+def get_seen_filter():
+    global _seen_filter
+    with _seen_filter_lock:
+        if _seen_filter is None:
+            try:
+                _seen_filter = BloomFilter(SEEN_FILTER_FILE)
+            except (OSError, ValueError) as e:
+                logger.warning("Error opening %s, starting a new seen-article filter: %s", SEEN_FILTER_FILE, e)
+                os.replace(SEEN_FILTER_FILE, SEEN_FILTER_FILE + ".bad")
+                _seen_filter = BloomFilter(SEEN_FILTER_FILE)
+            logger.info("Loaded seen-article filter with %s articles.", _seen_filter.count)
+        return _seen_filter